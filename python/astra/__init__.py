@@ -1,6 +1,7 @@
+import sqlite3
 from inspect import isgeneratorfunction
 from decorator import decorator
-from peewee import chunked, IntegrityError, SqliteDatabase
+from peewee import chunked, IntegrityError, SqliteDatabase, ForeignKeyField
 from playhouse.sqlite_ext import SqliteExtDatabase
 from sdsstools.configuration import get_config
 
@@ -27,7 +28,7 @@ def task(function, *args, **kwargs):
         * *frequency* (``int``) --
           The number of seconds to wait before saving the results to the database (default: 300).        
         * *result_frequency* (``int``) --
-          The number of results  to wait before saving the results to the database (default: 300).        
+          The number of results to wait before saving the results to the database (default: `batch_size`).
         * *batch_size* (``int``) --
           The number of rows to insert per batch (default: 1000).
         * *re_raise_exceptions* (``bool``) -- 
@@ -39,11 +40,11 @@ def task(function, *args, **kwargs):
 
     write_to_database = kwargs.pop("write_to_database", True)
     frequency = kwargs.pop("frequency", 300)
-    result_frequency = kwargs.pop("result_frequency", 100_000)
     batch_size = kwargs.pop("batch_size", 1000)
+    result_frequency = kwargs.pop("result_frequency", batch_size)
     re_raise_exceptions = kwargs.pop("re_raise_exceptions", True)
 
-    n_results, n_results_since_last_check_point, results = (0, 0, [])
+    n_results, results = (0, [])
     with Timer(
         function(*args, **kwargs), 
         frequency=frequency, 
@@ -72,7 +73,6 @@ def task(function, *args, **kwargs):
                     else:
                         results.append(result)
                         n_results += 1
-                        n_results_since_last_check_point += 1
             
             except StopIteration:
                 break
@@ -83,25 +83,27 @@ def task(function, *args, **kwargs):
                     raise
             
             else:
-                if write_to_database and (timer.check_point or n_results_since_last_check_point >= result_frequency):
+                # Flush whenever the buffer fills, so memory use is bounded by `result_frequency`
+                # records. The wall-clock `frequency` is only an upper bound between flushes.
+                if results and (len(results) >= result_frequency or timer.check_point):
                     with timer.pause():
 
                         # Add estimated overheads to each result.
                         timer.add_overheads(results)
-                        try:
-                            _bulk_insert(results, batch_size, re_raise_exceptions)
-                        except:
-                            log.exception(f"Exception trying to insert results to database:")
-                            if re_raise_exceptions:
-                                raise 
+                        if write_to_database:
+                            try:
+                                _bulk_insert(results, batch_size, re_raise_exceptions)
+                            except:
+                                log.exception(f"Exception trying to insert results to database:")
+                                if re_raise_exceptions:
+                                    raise 
 
                         # We yield here (instead of earlier) because in SQLite the result won't have a
                         # returning ID if we yield earlier. It's fine in PostgreSQL, but we want to 
                         # have consistent behaviour across backends.
                         yield from results
-                        log.debug(f"Yielded {len(results)} results")
+                        log.debug("Yielded %d results", len(results))
                         results = [] # avoid memory leak, which can happen if we are running
-                        n_results_since_last_check_point = 0
 
     # It is only at this point that we know:
     # - how many results were created
@@ -144,7 +146,13 @@ def _bulk_insert(results, batch_size, re_raise_exceptions=False):
         model.create_table()
         
     try:
-        if isinstance(database, (SqliteExtDatabase, SqliteDatabase)):
+        if isinstance(database, (SqliteExtDatabase, SqliteDatabase)) and sqlite3.sqlite_version_info >= (3, 35, 0):
+            # SQLite >= 3.35 supports RETURNING, so we can do one INSERT per batch and still get the
+            # primary keys back, which keeps expectations consistent between postgresql/sqlite.
+            with database.atomic():
+                _insert_many_returning(model, results, batch_size)
+
+        elif isinstance(database, (SqliteExtDatabase, SqliteDatabase)):
             # Do inserts in batches, but make sure that we get the RETURNING id behaviour so that there
             # is consistency in expectations between postgresql/sqlite
             for i, _result in enumerate(database.batch_commit(results, batch_size)):
@@ -178,11 +186,57 @@ def _bulk_insert(results, batch_size, re_raise_exceptions=False):
     
     return None
 
-try:
-    config = get_config(NAME)
-    
-except FileNotFoundError:
-    log.exception(f"No configuration file found for {NAME}:")
+
+def _insert_many_returning(model, results, batch_size):
+    """
+    Insert records in batches with `INSERT ... RETURNING`, and set the primary key on each record.
+
+    :param model:
+        The model class of the records.
+
+    :param results:
+        A list of records to insert.
+
+    :param batch_size:
+        The maximum number of rows to insert per statement.
+    """
+    primary_key = model._meta.primary_key
+    fields = [
+        field for field in model._meta.sorted_fields
+        if not (model._meta.auto_increment and field is primary_key)
+    ]
+    attrs = [
+        (field.object_id_name if isinstance(field, ForeignKeyField) else field.name)
+        for field in fields
+    ]
+    # Keep the bound parameters per statement under SQLite's default SQLITE_MAX_VARIABLE_NUMBER.
+    rows_per_statement = max(1, min(batch_size, 32766 // len(fields)))
+    for batch in chunked(results, rows_per_statement):
+        rows = [[getattr(result, attr) for attr in attrs] for result in batch]
+        cursor = (
+            model
+            .insert_many(rows, fields=fields)
+            .returning(primary_key)
+            .tuples()
+            .execute()
+        )
+        for result, (pk, ) in zip(batch, cursor):
+            setattr(result, primary_key.name, pk)
+    return None
+
+
+def __getattr__(name):
+    # Only read the configuration file the first time `astra.config` is accessed, rather than
+    # on every `import astra` (e.g., by every task and pipeline module).
+    if name == "config":
+        try:
+            config = get_config(NAME)
+        except FileNotFoundError:
+            log.exception(f"No configuration file found for {NAME}:")
+            raise AttributeError(name) from None
+        globals()["config"] = config
+        return config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 '''
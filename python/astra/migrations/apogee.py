@@ -294,10 +294,16 @@ def fix_version_id_edge_cases(version_ids=(13, 24, )):
                 log.info(f"Failed to update {source} (sdss_id={source.sdss_id}) to sdss_id={q_source['sdss_id']}. Updating dependencies.")
                 existing_source_pk = Source.get(sdss_id=source.sdss_id).pk
                 for expr, field in source.dependencies():
-                    for item in field.model.select().where(expr):
-                        log.info(f"\t{field.model} {item} source_pk={existing_source_pk}")
-                        item.source_pk = existing_source_pk
-                        item.save()
+                    # Only re-point foreign keys to the source itself, not those of deeper dependencies.
+                    if field.rel_model is not Source:
+                        continue
+                    n_dependents = (
+                        field.model
+                        .update({field: existing_source_pk})
+                        .where(expr)
+                        .execute()
+                    )
+                    log.info(f"\t{field.model}: {n_dependents} rows to source_pk={existing_source_pk}")
                 
                 log.info(f"Putting {source} up for deletion")
                 sources_for_deletion.append(source)
@@ -306,8 +312,13 @@ def fix_version_id_edge_cases(version_ids=(13, 24, )):
             log.warning(f"Could not find updated source for {source}")
 
     log.info(f"Deleting {len(sources_for_deletion)} sources")
-    for item in sources_for_deletion:
-        item.delete_instance()
+    for chunk in chunked(sources_for_deletion, 1000):
+        (
+            Source
+            .delete()
+            .where(Source.pk.in_([source.pk for source in chunk]))
+            .execute()
+        )
         
     return (updated, failed)
 
@@ -402,42 +413,63 @@ def migrate_sdss4_dr17_apogee_spectra_from_sdss5_catalogdb(batch_size: Optional[
     # Assign the Sun to have SDSS_ID = 0, because it's very special to me.
     source_data["VESTA"]["sdss_id"] = 0
                             
-    # Upsert the sources
+    # Upsert the sources, keeping the primary keys of any new sources.
+    # Need to be able to look up source_pks given a target_id. This is keyed on `sdss4_apogee_id`
+    # because it is always present, whereas `sdss_id` can be NULL from the outer joins above.
+    lookup_source_pk_given_sdss4_apogee_id = {}
     with database.atomic():
         with tqdm(desc="Upserting sources", total=len(source_data)) as pb:
             for chunk in chunked(source_data.values(), batch_size):
-                (
-                    Source
-                    .insert_many(chunk)
-                    .on_conflict_ignore()
-                    .execute()
+                lookup_source_pk_given_sdss4_apogee_id.update(
+                    (sdss4_apogee_id, pk) for pk, sdss4_apogee_id in (
+                        Source
+                        .insert_many(chunk)
+                        .on_conflict_ignore()
+                        .returning(Source.pk, Source.sdss4_apogee_id)
+                        .tuples()
+                        .execute()
+                    )
                 )
                 pb.update(min(batch_size, len(chunk)))
                 pb.refresh()
 
+    # Only sources that already existed need to be looked up, not the entire table.
     log.info(f"Getting data for sources")
-    q = (
-        Source
-        .select(
-            Source.pk,
-            Source.sdss_id,
+    missing = set(source_data).difference(lookup_source_pk_given_sdss4_apogee_id)
+    for chunk in chunked(missing, batch_size):
+        lookup_source_pk_given_sdss4_apogee_id.update(
+            Source
+            .select(Source.sdss4_apogee_id, Source.pk)
+            .where(Source.sdss4_apogee_id.in_(chunk))
+            .tuples()
         )
-        .tuples()
-        .iterator()
-    )
 
-    # Need to be able to look up source_pks given a target_id
-    lookup_source_pk_given_sdss_id = { sdss_id: pk for pk, sdss_id in q }
-    lookup_source_pk_given_sdss4_apogee_id = {}
-    for sdss4_apogee_id, attrs in source_data.items():
-        source_pk = lookup_source_pk_given_sdss_id[attrs["sdss_id"]]
-        lookup_source_pk_given_sdss4_apogee_id[sdss4_apogee_id] = source_pk
+    # Anything left conflicted on `sdss_id` with a source that does not have this `sdss4_apogee_id`
+    # (e.g., one created from SDSS-V data), so match those on `sdss_id`.
+    sdss4_apogee_ids_given_sdss_id = {}
+    for sdss4_apogee_id in missing.difference(lookup_source_pk_given_sdss4_apogee_id):
+        sdss_id = source_data[sdss4_apogee_id]["sdss_id"]
+        if sdss_id is None:
+            log.warning(f"Could not find or create source for sdss4_apogee_id={sdss4_apogee_id}")
+        else:
+            sdss4_apogee_ids_given_sdss_id.setdefault(sdss_id, []).append(sdss4_apogee_id)
+
+    for chunk in chunked(sdss4_apogee_ids_given_sdss_id, batch_size):
+        q_sources = (
+            Source
+            .select(Source.sdss_id, Source.pk)
+            .where(Source.sdss_id.in_(chunk))
+            .tuples()
+        )
+        for sdss_id, pk in q_sources:
+            for sdss4_apogee_id in sdss4_apogee_ids_given_sdss_id[sdss_id]:
+                lookup_source_pk_given_sdss4_apogee_id[sdss4_apogee_id] = pk
     
     q = (
         Visit
         .select(
             Visit.mjd,
-            Visit.plate,
+            fn.ltrim(Visit.plate).alias("plate"),
             Visit.telescope,
             Visit.field,
             Visit.apogee_id.alias("obj"), # see notes in astra.models.apogee.ApogeeVisitSpectrum about this
@@ -448,7 +480,7 @@ def migrate_sdss4_dr17_apogee_spectra_from_sdss5_catalogdb(batch_size: Optional[
             Visit.ra.alias("input_ra"),
             Visit.dec.alias("input_dec"),
             Visit.snr,
-            Visit.file,
+            fn.substr(fn.ltrim(Visit.file), 1, 2).alias("prefix"),
 
             # Radial velocity information
             Visit.vrel.alias("v_rel"),
@@ -473,8 +505,6 @@ def migrate_sdss4_dr17_apogee_spectra_from_sdss5_catalogdb(batch_size: Optional[
     
     apogee_visit_spectra = []
     for row in tqdm(q.iterator(), total=limit or 1, desc="Retrieving spectra"):
-        basename = row.pop("file")
-        row["plate"] = row["plate"].lstrip()        
         if row["telescope"] == "apo1m":
             row["reduction"] = row["obj"]
         
@@ -483,7 +513,6 @@ def migrate_sdss4_dr17_apogee_spectra_from_sdss5_catalogdb(batch_size: Optional[
             "source_pk": source_pk,
             "release": "dr17",
             "apred": "dr17",
-            "prefix": basename.lstrip()[:2],
             **row
         })
 
@@ -792,62 +821,77 @@ def fix_apvisit_instances_of_invalid_gaia_dr3_source_id(fuzz_ratio_min=75):
             table_name = "sdss_id_stacked"
 
     # Fix any instances where gaia_dr3_source_id = 0
+    # (Select the source as well, so that `record.source` does not need a query per record.)
     q = (
         ApogeeVisitSpectrum
-        .select()
+        .select(ApogeeVisitSpectrum, Source)
         .join(Source, on=(ApogeeVisitSpectrum.source_pk == Source.pk))
         .where(
             (Source.gaia_dr3_source_id <= 0) | (Source.gaia_dr3_source_id.is_null())
         )
     )
-    N_broken = q.count()
+    records = list(q)
+    N_broken = len(records)
     log.warning(f"Trying to fix {N_broken} instances where gaia_dr3_source_id <= 0 or NULL. This could take a few minutes.")
 
-    N_fixed = 0
-    for record in tqdm(q.iterator(), total=N_broken):
-
+    designations = []
+    for record in records:
         sdss4_apogee_id = record.source.sdss4_apogee_id or record.obj
         if sdss4_apogee_id.startswith("2M") or sdss4_apogee_id.startswith("AP"):
-            designation = sdss4_apogee_id[2:]
+            designations.append(sdss4_apogee_id[2:])
         else:
-            designation = sdss4_apogee_id
+            designations.append(sdss4_apogee_id)
 
+    # Look up the catalog identifiers for all records at once, instead of two queries per record.
+    catalogids = {}
+    for chunk in chunked(set(designations), 1000):
         q = (
             CatalogToTwoMassPSC
-            .select(CatalogToTwoMassPSC.catalog)
+            .select(TwoMassPSC.designation, CatalogToTwoMassPSC.catalog)
             .join(TwoMassPSC, on=(TwoMassPSC.pts_key == CatalogToTwoMassPSC.target))
-            .where(TwoMassPSC.designation == designation)
+            .where(TwoMassPSC.designation.in_(chunk))
             .tuples()
-            .first()
         )
-        if q:
-            catalogid, = q
-            q_identifiers = (
-                Catalog
-                .select(
-                    Catalog.ra,
-                    Catalog.dec,
-                    Catalog.catalogid,
-                    Catalog.version_id.alias("version_id"),
-                    Catalog.lead,
-                    SDSS_ID_Flat.sdss_id,
-                    SDSS_ID_Flat.n_associated,
-                    SDSS_ID_Stacked.catalogid21,
-                    SDSS_ID_Stacked.catalogid25,
-                    SDSS_ID_Stacked.catalogid31,     
-                    CatalogToGaia_DR2.target.alias("gaia_dr2_source_id"),
-                    CatalogToGaia_DR3.target.alias("gaia_dr3_source_id"),
-                )
-                .join(SDSS_ID_Flat, JOIN.LEFT_OUTER, on=(Catalog.catalogid == SDSS_ID_Flat.catalogid))
-                .join(SDSS_ID_Stacked, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.sdss_id == SDSS_ID_Flat.sdss_id))
-                .switch(Catalog)
-                .join(CatalogToGaia_DR3, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.catalogid31 == CatalogToGaia_DR3.catalog))
-                .switch(Catalog)
-                .join(CatalogToGaia_DR2, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.catalogid31 == CatalogToGaia_DR2.catalog))
-                .where(Catalog.catalogid == catalogid)
-                .dicts()
-                .first()
+        for designation, catalogid in q:
+            catalogids.setdefault(designation, catalogid)
+
+    identifiers = {}
+    for chunk in chunked(set(catalogids.values()), 1000):
+        q = (
+            Catalog
+            .select(
+                Catalog.ra,
+                Catalog.dec,
+                Catalog.catalogid,
+                Catalog.version_id.alias("version_id"),
+                Catalog.lead,
+                SDSS_ID_Flat.sdss_id,
+                SDSS_ID_Flat.n_associated,
+                SDSS_ID_Stacked.catalogid21,
+                SDSS_ID_Stacked.catalogid25,
+                SDSS_ID_Stacked.catalogid31,     
+                CatalogToGaia_DR2.target.alias("gaia_dr2_source_id"),
+                CatalogToGaia_DR3.target.alias("gaia_dr3_source_id"),
             )
+            .join(SDSS_ID_Flat, JOIN.LEFT_OUTER, on=(Catalog.catalogid == SDSS_ID_Flat.catalogid))
+            .join(SDSS_ID_Stacked, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.sdss_id == SDSS_ID_Flat.sdss_id))
+            .switch(Catalog)
+            .join(CatalogToGaia_DR3, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.catalogid31 == CatalogToGaia_DR3.catalog))
+            .switch(Catalog)
+            .join(CatalogToGaia_DR2, JOIN.LEFT_OUTER, on=(SDSS_ID_Stacked.catalogid31 == CatalogToGaia_DR2.catalog))
+            .where(Catalog.catalogid.in_(chunk))
+            .dicts()
+        )
+        for row in q:
+            identifiers.setdefault(row["catalogid"], row)
+
+    N_fixed = 0
+    for record, designation in tqdm(zip(records, designations), total=N_broken):
+
+        sdss4_apogee_id = record.source.sdss4_apogee_id or record.obj
+        catalogid = catalogids.get(designation, None)
+        if catalogid is not None:
+            q_identifiers = identifiers[catalogid]
 
             # Update this source
             for key, value in q_identifiers.items():
@@ -969,14 +1013,16 @@ def migrate_new_apstar_only_from_sdss5_apogee_drpdb(
     # q = q.order_by(SDSS_ID_Flat.sdss_id.asc())    
     spectrum_data = {}
     unknown_stars = []
+    # These are the same for every star, so build them once instead of per row.
+    star_defaults = dict(
+        release="sdss5",
+        filetype="apStar",
+        apstar="stars",
+        apred=apred,
+    )
     for star in tqdm(q.dicts().iterator(), total=1, desc="Getting spectra"):
 
-        star.update(
-            release="sdss5",
-            filetype="apStar",
-            apstar="stars",
-            apred=apred,
-        )
+        star.update(star_defaults)
         # This part assumes that we have already ingested everything from the visits, but that might not be true (e.g., when testing things).
         # TODO: create sources if we dont have them
         #sdss_id = star.pop("sdss_id")
@@ -1245,7 +1291,7 @@ def migrate_new_apvisit_from_sdss5_apogee_drpdb(
 
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
@@ -1337,7 +1383,7 @@ def migrate_new_apvisit_from_sdss5_apogee_drpdb(
         assert row["catalogid"] is not None
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
@@ -1580,14 +1626,16 @@ def migrate_new_apvisit_from_sdss5_apogee_drpdb(
     
     spectrum_data = {}
     unknown_stars = []
+    # These are the same for every star, so build them once instead of per row.
+    star_defaults = dict(
+        release="sdss5",
+        filetype="apStar",
+        apstar="stars",
+        apred=apred,
+    )
     for star in tqdm(q.dicts().iterator(), total=1, desc="Getting spectra"):
 
-        star.update(
-            release="sdss5",
-            filetype="apStar",
-            apstar="stars",
-            apred=apred,
-        )
+        star.update(star_defaults)
         # This part assumes that we have already ingested everything from the visits, but that might not be true (e.g., when testing things).
         # TODO: create sources if we dont have them
         #sdss_id = star.pop("sdss_id")
@@ -2115,7 +2163,7 @@ def migrate_1p3_apvisit_from_sdss5_apogee_drpdb(
 
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
@@ -2236,7 +2284,7 @@ SDSS_ID (from APOGEE DRP): {apogee_drp_sdss_id}
         assert row["catalogid"] is not None
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
@@ -2598,7 +2646,7 @@ def migrate_pre_1p3_apvisit_from_sdss5_apogee_drpdb(
 
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
@@ -2692,7 +2740,7 @@ def migrate_pre_1p3_apvisit_from_sdss5_apogee_drpdb(
         assert row["catalogid"] is not None
         catalogid = row["catalogid"]        
         
-        this_source_data = dict(zip(source_only_keys, [row.pop(k) for k in source_only_keys]))
+        this_source_data = {k: row.pop(k) for k in source_only_keys}
 
         if catalogid in source_data:
             # make sure the only difference is SDSS_ID
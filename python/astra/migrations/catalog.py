@@ -741,7 +741,8 @@ def migrate_gaia_source_ids(
         .limit(limit)
     )
 
-    updated = []
+    # Keyed by primary key, because a source can match more than once.
+    updated = {}
     with tqdm(total=1) as pb:
         for chunk in chunked(q, batch_size):
 
@@ -763,7 +764,7 @@ def migrate_gaia_source_ids(
             for catalogid, gaia_dr3_source_id in q:
                 source = source_by_catalogid[catalogid]
                 source.gaia_dr3_source_id = gaia_dr3_source_id
-                updated.append(source)
+                updated[source.pk] = source
 
             q = (
                 CatalogToGaia_DR2
@@ -777,12 +778,12 @@ def migrate_gaia_source_ids(
             for catalogid, gaia_dr2_source_id in q:
                 source = source_by_catalogid[catalogid]
                 source.gaia_dr2_source_id = gaia_dr2_source_id
-                updated.append(source)            
+                updated[source.pk] = source
     
         pb.update(batch_size)
     
-    n_updated, updated = (0, list(set(updated)))
-    for chunk in chunked(updated, batch_size):
+    n_updated = 0
+    for chunk in chunked(updated.values(), batch_size):
         n_updated += (
             Source
             .bulk_update(
@@ -572,7 +572,7 @@ def compute_f_night_time_for_boss_visits(
         .limit(limit)
     )
 
-    get_obs_time = lambda v: Time((v.tai_beg + 0.5 * (v.tai_end - v.tai_beg))/(24*3600), format="mjd").datetime
+    get_obs_time = lambda v: Time((v.tai_beg + 0.5 * (v.tai_end - v.tai_beg))/(24*3600), format="mjd")
 
     return _compute_f_night_time_for_visits(q, BossVisitSpectrum, get_obs_time, batch_size, n_time, max_workers)
 
@@ -632,7 +632,9 @@ def _compute_f_night_time_for_visits(q, model, get_obs_time, batch_size, n_time,
 
     futures, visit_by_pk, observatories = ([], {}, {})
     for visit in tqdm(q.iterator(), desc="Submitting jobs", total=1):
-        time = Time(get_obs_time(visit))
+        time = get_obs_time(visit)
+        if not isinstance(time, Time):
+            time = Time(time)
         observatory_name = visit.telescope[:3].upper()
 
         try:
@@ -2,6 +2,7 @@ import numpy as np
 import os
 from astra.utils import log, expand_path
 from astra.models.source import Source
+from astra.models.base import database
 from peewee import chunked
 from astropy.coordinates import SkyCoord
 from astropy import units as u
@@ -17,6 +18,25 @@ from dustmaps.bayestar import BayestarQuery
 # TODO: This python file is a lot of spaghetti code. sorry about that. refactor this!
 
 von = lambda v: v or np.nan
+
+# Fields set by `_update_reddening_on_source`.
+REDDENING_FIELDS = [
+    Source.ebv_zhang_2023,
+    Source.e_ebv_zhang_2023,
+    Source.ebv_rjce_glimpse,
+    Source.e_ebv_rjce_glimpse,
+    Source.ebv_rjce_allwise,
+    Source.e_ebv_rjce_allwise,
+    Source.ebv_sfd,
+    Source.e_ebv_sfd,
+    Source.ebv_bayestar_2019,
+    Source.e_ebv_bayestar_2019,
+    Source.ebv_edenhofer_2023,
+    Source.e_ebv_edenhofer_2023,
+    Source.ebv,
+    Source.e_ebv,
+    Source.ebv_flags,
+]
     
 def _fix_w2_flux():
     (
@@ -26,19 +46,26 @@ def _fix_w2_flux():
         .execute()
     )
     
-def _fix_rjce_glimpse(sfd, edenhofer2023, bayestar2019):
+def _fix_rjce_glimpse(sfd, edenhofer2023, bayestar2019, batch_size=1000):
     sources = list(
         Source
         .select()
         .where(Source.mag4_5 > 99)
     )
+    updated = []
     for s in sources:
         s.mag4_5 = None
         s.d4_5m = None
         s.rms_f4_5 = None
         
         s = _update_reddening_on_source(s, sfd, edenhofer2023, bayestar2019)
-        s.save()    
+        if s is not None:
+            updated.append(s)
+
+    fields = [Source.mag4_5, Source.d4_5m, Source.rms_f4_5] + REDDENING_FIELDS
+    with database.atomic():
+        for chunk in chunked(updated, batch_size):
+            Source.bulk_update(chunk, fields)
             
     
 def _update_reddening_on_source(source, sfd, edenhofer2023, bayestar2019, raise_exceptions=False):
@@ -201,28 +228,13 @@ def update_reddening(where=Source.ebv.is_null(), batch_size=1000, max_workers: i
     if where:
         q = q.where(where)
 
-    fields = [
-        Source.ebv_zhang_2023,
-        Source.e_ebv_zhang_2023,
-        Source.ebv_rjce_glimpse,
-        Source.e_ebv_rjce_glimpse,
-        Source.ebv_rjce_allwise,
-        Source.e_ebv_rjce_allwise,
-        Source.ebv_sfd,
-        Source.e_ebv_sfd,
-        Source.ebv_bayestar_2019,
-        Source.e_ebv_bayestar_2019,
-        Source.ebv_edenhofer_2023,
-        Source.e_ebv_edenhofer_2023,
-        Source.ebv,
-        Source.e_ebv,
-        Source.ebv_flags,
-    ]
+    fields = REDDENING_FIELDS
     
 
-    with tqdm(total=len(q)) as pb:
+    # Stream the sources rather than holding every row of the query in memory.
+    with tqdm(total=q.count()) as pb:
             
-        for chunk in chunked(q, batch_size):
+        for chunk in chunked(q.iterator(), batch_size):
             updated = []
             for source in chunk:
                 s = _update_reddening_on_source(source, *maps)
@@ -232,7 +244,7 @@ def update_reddening(where=Source.ebv.is_null(), batch_size=1000, max_workers: i
             if len(updated) > 0:
                 Source.bulk_update(updated, fields)
             
-            pb.update(batch_size)
+            pb.update(len(chunk))
             
     
 
@@ -111,7 +111,7 @@ def migrate_carton_assignments_to_bigbitfield(
             log.warning(f"  Carton pk={carton_pk} had {len(sdss_ids)} (e.g., {sdss_ids[0]}) and no bit exists in the semaphore file")
 
     if len(missing) > 0:
-        log.warning(f"There were {len(missing)} sdss_ids with target assignments that are not in Astra's database (e.g., {missing[0]})")
+        log.warning(f"There were {len(missing)} sdss_ids with target assignments that are not in Astra's database (e.g., {next(iter(missing))})")
 
     updated = 0
     with tqdm(desc="Updating", total=len(update)) as pb:
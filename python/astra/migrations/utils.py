@@ -4,9 +4,10 @@ from astra.models.base import database
 from astra.models.spectrum import Spectrum
 from tqdm import tqdm
 
-def generate_new_spectrum_pks(N, batch_size=100):
+def generate_new_spectrum_pks(N, batch_size=10_000):
     with database.atomic():
-        # Need to chunk this to avoid SQLite limits.
+        # Need to chunk this to avoid SQLite limits. Each row binds one variable, and SQLite
+        # versions with RETURNING (>= 3.35) allow 32766 variables per statement.
         with tqdm(desc="Assigning spectrum identifiers", unit="spectra", total=N) as pb:
             for chunk in chunked([{"spectrum_type_flags": 0}] * N, batch_size):                
                 yield from flatten(
@@ -20,7 +21,7 @@ def generate_new_spectrum_pks(N, batch_size=100):
                 pb.refresh()
 
 
-def enumerate_new_spectrum_pks(iter, batch_size=100):
+def enumerate_new_spectrum_pks(iter, batch_size=10_000):
     N = len(iter)
 
     with database.atomic():
@@ -13,7 +13,7 @@ from peewee import (
 import numpy as np
 import os
 from playhouse.hybrid import hybrid_property
-from astra.models.fields import PixelArray, BitField, LogLambdaArrayAccessor
+from astra.models.fields import PixelArray, BitField, LogLambdaArrayAccessor, SharedPixelArrayAccessorFITS
 from astra.models.base import BaseModel
 from astra.models.spectrum import (Spectrum, SpectrumMixin)
 from astra.models.source import Source
@@ -341,16 +341,19 @@ class ApogeeVisitSpectrumInApStar(BaseModel, SpectrumMixin):
         help_text=Glossary.wavelength
     )
     flux = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=1,
         transform=transform,
         help_text=Glossary.flux,
     )
     ivar = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=2,
         transform=lambda *a, **k: _transform_err_to_ivar(transform(*a, **k)),
         help_text=Glossary.ivar,
     )
     pixel_flags = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=3,
         transform=transform,
         help_text=Glossary.pixel_flags,
@@ -370,7 +373,7 @@ class ApogeeVisitSpectrumInApStar(BaseModel, SpectrumMixin):
     field = TextField(default="", null=False, help_text=Glossary.field) 
     prefix = TextField(default="", null=False, help_text=Glossary.prefix) # not used in SDSS-V
     plate = TextField(help_text=Glossary.plate)
-    mjd = IntegerField(help_text=Glossary.mjd)
+    mjd = IntegerField(index=True, help_text=Glossary.mjd)
     fiber = IntegerField(help_text=Glossary.fiber)
     reduction = TextField(null=True, default="", help_text=Glossary.reduction) # only used for DR17 apo1m spectra
 
@@ -475,7 +478,7 @@ class ApogeeCoaddedSpectrumInApStar(BaseModel, SpectrumMixin):
 
     #> Observing Span
     min_mjd = IntegerField(null=True, help_text="Minimum MJD of visits")
-    max_mjd = IntegerField(null=True, help_text="Maximum MJD of visits")
+    max_mjd = IntegerField(null=True, index=True, help_text="Maximum MJD of visits")
 
     #> Number and Quality of Visits
     n_entries = IntegerField(null=True, help_text="apStar entries for this SDSS4_APOGEE_ID") # Only present in DR17
@@ -523,16 +526,19 @@ class ApogeeCoaddedSpectrumInApStar(BaseModel, SpectrumMixin):
         help_text=Glossary.wavelength
     )
     flux = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=1,
         transform=_transform_coadded_spectrum,
         help_text=Glossary.flux
     )
     ivar = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=2,
         transform=lambda *a, **k: _transform_err_to_ivar(_transform_coadded_spectrum(*a, **k)),
         help_text=Glossary.ivar
     )
     pixel_flags = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=3,
         transform=_transform_coadded_spectrum,
         help_text=Glossary.pixel_flags
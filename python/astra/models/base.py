@@ -49,7 +49,9 @@ def get_database_and_schema(config):
             'cache_size': -1 * 64000,  # 64MB
             'foreign_keys': 1,
             'ignore_check_constraints': 0,
-            'synchronous': 0
+            'synchronous': 0,
+            'temp_store': 'memory',
+            'mmap_size': 256 * 1024 * 1024, # 256MB
         }
     )
 
@@ -65,7 +65,7 @@ class BossVisitSpectrum(BaseModel, SpectrumMixin):
     release = TextField(help_text=Glossary.release)
     filetype = TextField(default="specFull", help_text=Glossary.filetype)
     run2d = TextField(help_text=Glossary.run2d)
-    mjd = IntegerField(help_text=Glossary.mjd)
+    mjd = IntegerField(index=True, help_text=Glossary.mjd)
     fieldid = IntegerField(help_text=Glossary.fieldid)
     catalogid = BigIntegerField(help_text=Glossary.catalogid)
     healpix = IntegerField(help_text=Glossary.healpix) # This should be the same as the Source-level field.
@@ -8,6 +8,7 @@ from peewee import (
 import h5py
 
 from astropy.io import fits
+from functools import lru_cache
 from astra.utils import expand_path
 
 class BitField(_BitField):
@@ -55,6 +56,43 @@ class BitField(_BitField):
         return FlagDescriptor(self, value, help_text)
 
 
+class _SharedFITSFile:
+
+    """
+    A FITS file whose extensions are read on demand, and kept in memory once read.
+
+    Only the extensions that are accessed are read, and the file is only open while reading.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._hdus = {}
+
+    def __getitem__(self, ext):
+        try:
+            return self._hdus[ext]
+        except KeyError:
+            with fits.open(self.path, memmap=False, lazy_load_hdus=True) as image:
+                hdu = image[ext]
+                hdu.data # read the data before the file is closed
+            self._hdus[ext] = hdu
+            return hdu
+
+
+@lru_cache(maxsize=8)
+def _open_shared_fits(path):
+    """
+    Return a cached `_SharedFITSFile` for the given path.
+
+    Many spectra can be stored in the same file (e.g., visits in an apStar or mwmVisit file), so 
+    this avoids reading the same extensions once per spectrum.
+
+    :param path:
+        The (expanded) path of the FITS file.
+    """
+    return _SharedFITSFile(path)
+
+
 class BasePixelArrayAccessor(object):
     
     """A base pixel array accessor."""
@@ -118,31 +156,58 @@ class PixelArrayAccessorFITS(BasePixelArrayAccessor):
                 # Load them all.
                 instance.__pixel_data__ = {}
                 with fits.open(expand_path(instance.path)) as image:
-                    for name, accessor in instance._meta.pixel_fields.items():
+                    self._load_pixel_arrays(instance, image)
+                
+                return instance.__pixel_data__[self.name]
 
-                        if callable(accessor.ext):
-                            ext = accessor.ext(instance)
-                        else:
-                            ext = accessor.ext
+        return self.field
+    
+    def _load_pixel_arrays(self, instance, image):
+        for name, accessor in instance._meta.pixel_fields.items():
 
-                        if ext is None:
-                            # non-FITSy looking thing
-                            continue
-                    
-                        data = image[ext].data
-                        
-                        try:
-                            value = data[accessor.column_name] # column acess
-                        except:
-                            value = data # image access
-                        
-                        value = np.copy(value)
-                        
-                        if accessor.transform is not None:
-                            value = accessor.transform(value, image, instance)
-                        
-                        instance.__pixel_data__.setdefault(name, value)
-                
+            if callable(accessor.ext):
+                ext = accessor.ext(instance)
+            else:
+                ext = accessor.ext
+
+            if ext is None:
+                # non-FITSy looking thing
+                continue
+        
+            data = image[ext].data
+            
+            try:
+                value = data[accessor.column_name] # column acess
+            except:
+                value = data # image access
+            
+            value = np.copy(value)
+            
+            if accessor.transform is not None:
+                value = accessor.transform(value, image, instance)
+            
+            instance.__pixel_data__.setdefault(name, value)
+        return None
+
+
+class SharedPixelArrayAccessorFITS(PixelArrayAccessorFITS):
+
+    """
+    A class to access pixel arrays stored in a FITS file that is shared by many spectra (e.g., 
+    apStar, mwmVisit, and mwmStar files). Recently read files are cached, and only the extensions
+    that are needed are read.
+    """
+
+    def __get__(self, instance, instance_type=None):
+        if instance is not None:
+            self._initialise_pixel_array(instance)
+            
+            try:
+                return instance.__pixel_data__[self.name]
+            except KeyError:
+                # Load them all.
+                instance.__pixel_data__ = {}
+                self._load_pixel_arrays(instance, _open_shared_fits(expand_path(instance.path)))
                 return instance.__pixel_data__[self.name]
 
         return self.field
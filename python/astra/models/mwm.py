@@ -20,7 +20,7 @@ from astra.models.base import BaseModel
 from astra.models.boss import BossVisitSpectrum
 from astra.models.source import Source
 from astra.models.spectrum import Spectrum, SpectrumMixin
-from astra.models.fields import PixelArray, BitField, LogLambdaArrayAccessor
+from astra.models.fields import PixelArray, BitField, LogLambdaArrayAccessor, SharedPixelArrayAccessorFITS
 from astra.glossary import Glossary
 
 from playhouse.postgres_ext import ArrayField
@@ -90,7 +90,7 @@ class BossRestFrameVisitSpectrum(MWMVisitMixin, SpectrumMixin):
     
     #> Related Data Product Keywords
     run2d = TextField(help_text=Glossary.run2d)
-    mjd = IntegerField(help_text=Glossary.mjd)
+    mjd = IntegerField(index=True, help_text=Glossary.mjd)
     fieldid = IntegerField(help_text=Glossary.fieldid)
     catalogid = BigIntegerField(help_text=Glossary.catalogid)
 
@@ -210,13 +210,13 @@ class BossRestFrameVisitSpectrum(MWMVisitMixin, SpectrumMixin):
         ),
         help_text=Glossary.wavelength
     )    
-    flux = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.flux)
-    ivar = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.ivar)
-    wresl = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.wresl)
-    pixel_flags = PixelArray(ext=get_boss_ext, transform=transform_flat, column_name="or_mask", help_text=Glossary.pixel_flags)
+    flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.flux)
+    ivar = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.ivar)
+    wresl = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.wresl)
+    pixel_flags = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, column_name="or_mask", help_text=Glossary.pixel_flags)
 
     #> NMF Continuum Model
-    continuum = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.continuum)
+    continuum = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.continuum)
     nmf_rchi2 = FloatField(null=True, help_text=Glossary.nmf_rchi2)
     nmf_flags = BitField(default=0, help_text="NMF Continuum method flags")
 
@@ -280,7 +280,7 @@ class BossCombinedSpectrum(MWMStarMixin, SpectrumMixin):
         
     #> Observing Span
     min_mjd = IntegerField(null=True, help_text="Minimum MJD of visits")
-    max_mjd = IntegerField(null=True, help_text="Maximum MJD of visits")
+    max_mjd = IntegerField(null=True, index=True, help_text="Maximum MJD of visits")
     n_visits = IntegerField(null=True, help_text="Number of BOSS visits")
     n_good_visits = IntegerField(null=True, help_text="Number of 'good' BOSS visits")
     n_good_rvs = IntegerField(null=True, help_text="Number of 'good' BOSS radial velocities")
@@ -347,13 +347,13 @@ class BossCombinedSpectrum(MWMStarMixin, SpectrumMixin):
         ),
         help_text=Glossary.wavelength
     )    
-    flux = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.flux)
-    ivar = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.ivar)
-    pixel_flags = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.pixel_flags)        
+    flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.flux)
+    ivar = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.ivar)
+    pixel_flags = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.pixel_flags)        
     
     #> NMF Continuum Model
-    continuum = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.continuum)
-    nmf_rectified_model_flux = PixelArray(ext=get_boss_ext, transform=transform_flat, help_text=Glossary.nmf_rectified_model_flux)
+    continuum = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.continuum)
+    nmf_rectified_model_flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_boss_ext, transform=transform_flat, help_text=Glossary.nmf_rectified_model_flux)
     nmf_rchi2 = FloatField(null=True, help_text=Glossary.nmf_rchi2)
     nmf_flags = BitField(default=0, help_text="NMF Continuum method flags")
 
@@ -414,7 +414,7 @@ class ApogeeCombinedSpectrum(MWMStarMixin, SpectrumMixin):
             
     #> Observing Span
     min_mjd = IntegerField(null=True, help_text="Minimum MJD of visits")
-    max_mjd = IntegerField(null=True, help_text="Maximum MJD of visits")
+    max_mjd = IntegerField(null=True, index=True, help_text="Maximum MJD of visits")
 
     #> Number and Quality of Visits
     n_entries = IntegerField(null=True, help_text="apStar entries for this SDSS4_APOGEE_ID") # Only present in DR17
@@ -464,17 +464,18 @@ class ApogeeCombinedSpectrum(MWMStarMixin, SpectrumMixin):
         ),
         help_text=Glossary.wavelength
     )
-    flux = PixelArray(ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.flux)
-    ivar = PixelArray(ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.ivar)
+    flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.flux)
+    ivar = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.ivar)
     pixel_flags = PixelArray(
+        accessor_class=SharedPixelArrayAccessorFITS,
         ext=get_apogee_ext, 
         transform=lambda x, *_: np.array(x, dtype=np.uint64).flatten(), 
         help_text=Glossary.pixel_flags
     )
     
     #> NMF Continuum Model
-    continuum = PixelArray(ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.continuum)
-    nmf_rectified_model_flux = PixelArray(ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.nmf_rectified_model_flux)
+    continuum = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.continuum)
+    nmf_rectified_model_flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, transform=transform_flat, help_text=Glossary.nmf_rectified_model_flux)
     nmf_rchi2 = FloatField(null=True, help_text=Glossary.nmf_rchi2)
     nmf_flags = BitField(default=0, help_text="NMF Continuum method flags")
 
@@ -625,12 +626,12 @@ class ApogeeRestFrameVisitSpectrum(MWMVisitMixin, SpectrumMixin):
     n_components = IntegerField(null=True, help_text=Glossary.n_components)    
 
     #> Spectral Data
-    flux = PixelArray(ext=get_apogee_ext, help_text=Glossary.flux)
-    ivar = PixelArray(ext=get_apogee_ext, help_text=Glossary.ivar)
-    pixel_flags = PixelArray(ext=get_apogee_ext, help_text=Glossary.pixel_flags)        
+    flux = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, help_text=Glossary.flux)
+    ivar = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, help_text=Glossary.ivar)
+    pixel_flags = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, help_text=Glossary.pixel_flags)        
     
     #> NMF Continuum Model
-    continuum = PixelArray(ext=get_apogee_ext, help_text=Glossary.continuum)
+    continuum = PixelArray(accessor_class=SharedPixelArrayAccessorFITS, ext=get_apogee_ext, help_text=Glossary.continuum)
     nmf_rchi2 = FloatField(null=True, help_text=Glossary.nmf_rchi2)
     nmf_flags = BitField(default=0, help_text="NMF Continuum method flags")
 
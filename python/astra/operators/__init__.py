@@ -1,9 +1,6 @@
-from astra import models
 from astra.utils import log, callable
 from inspect import getfullargspec
 from peewee import fn, JOIN
-from astropy.time import Time
-from airflow.exceptions import AirflowSkipException
 try:
     from airflow.models.baseoperator import BaseOperator
 except ImportError:
@@ -35,6 +32,8 @@ class Operator(BaseOperator):
 
     def where_by_execution_date(self, input_model, context, left_key="prev_execution_date", right_key="execution_date"):
 
+        from astropy.time import Time
+
         # A decision was made here.
         # If you cut between prev_execution_date and next_execution_date then it actually runs the same stuff 3x because a DAG on a daily frequency will
         # search 24 hrs before and 24 hrs after.
@@ -61,7 +60,10 @@ class Operator(BaseOperator):
 
 
     def execute(self, context):
-        
+        # Airflow imports this module whenever it parses a DAG file, so only import the models
+        # (and everything they pull in) when the operator actually runs.
+        from astra import models
+
         kwds = self.task_kwargs.copy()
 
         task = callable(self.task_name) 
@@ -9,7 +9,7 @@ from dataclasses import dataclass
 import tempfile
 from collections import OrderedDict, namedtuple
 import numpy as np
-from functools import partial
+from functools import partial, lru_cache
 from astropy.io import fits
 
 @dataclass(frozen=True)
@@ -107,12 +107,20 @@ def unnormalize_predictions(predictions: torch.Tensor) -> torch.Tensor:
     - torch.Tensor: Output tensor of shape (batch_size, 4) where each column has been unnormalized using 
       the mean and standard deviation stored in stellar_parameter_stats.
     """
-    predictions[:, 0] = unnormalize(predictions[:, 0], stellar_parameter_stats.LOGG.MEAN, stellar_parameter_stats.LOGG.STD)
-    predictions[:, 1] = unnormalize(predictions[:, 1], stellar_parameter_stats.LOGTEFF.MEAN, stellar_parameter_stats.LOGTEFF.STD)
-    predictions[:, 2] = unnormalize(predictions[:, 2], stellar_parameter_stats.FEH.MEAN, stellar_parameter_stats.FEH.STD)
-
+    means, stds = _unnormalization_stats(predictions.device, predictions.dtype)
+    predictions[:, :3] = unnormalize(predictions[:, :3], means, stds)
     return predictions
 
+@lru_cache
+def _unnormalization_stats(device: torch.device, dtype: torch.dtype):
+    """
+    Return the (LOGG, LOGTEFF, FEH) means and standard deviations as tensors on the given device.
+    """
+    stats = (stellar_parameter_stats.LOGG, stellar_parameter_stats.LOGTEFF, stellar_parameter_stats.FEH)
+    means = torch.tensor([each.MEAN for each in stats], device=device, dtype=dtype)
+    stds = torch.tensor([each.STD for each in stats], device=device, dtype=dtype)
+    return (means, stds)
+
 def franken_load(load_path: str, chunks: int) -> OrderedDict:
     """
     Loads a PyTorch model from multiple binary files that were previously split.
@@ -152,6 +160,9 @@ def franken_load(load_path: str, chunks: int) -> OrderedDict:
 
     return state_dict
 
+# Noise buffers for `create_uncertainties_batch`, keyed by (shape, device, dtype).
+_NOISE_CACHE = {}
+
 def create_uncertainties_batch(flux: torch.Tensor, error: torch.Tensor, num_uncertainty_draws: int) -> torch.Tensor:
     """
     Creates a batch of flux tensors with added noise from the specified error tensors.
@@ -165,7 +176,14 @@ def create_uncertainties_batch(flux: torch.Tensor, error: torch.Tensor, num_unce
     - flux_with_noise: torch.Tensor, A torch.Tensor representing the batch of flux tensors with added noise from the 
       specified error tensors.
     """
-    normal_sample = torch.randn((num_uncertainty_draws, *error.shape[-2:]))
+    shape = (num_uncertainty_draws, *error.shape[-2:])
+    key = (shape, error.device, error.dtype)
+    try:
+        normal_sample = _NOISE_CACHE[key]
+    except KeyError:
+        normal_sample = _NOISE_CACHE[key] = torch.empty(shape, device=error.device, dtype=error.dtype)
+    # Re-draw in place so that we do not allocate a new noise tensor for every spectrum.
+    normal_sample.normal_()
     return flux + error * normal_sample
 
 def log_scale_flux(flux: torch.Tensor) -> torch.Tensor:
@@ -195,44 +213,38 @@ def open_apogee_fits(file_path: str):
         error = hdul[2].data.astype(np.float32)[0]
         wavlen = np.zeros_like(flux)
         flux = np.nan_to_num(flux, nan=0.0)
-    flux = torch.from_numpy(flux).float()
-    error = torch.from_numpy(error).float()
+    flux = torch.from_numpy(flux)
+    error = torch.from_numpy(error)
 
     return flux, error, wavlen
 
-def make_prediction(spectra, error, wavlen,num_uncertainty_draws,model,device):
+def make_prediction(spectra, error, wavlen,num_uncertainty_draws,model,device,mixed_precision=False):
 
     # log scale spectra
-    normalized_spectra = log_scale_flux(spectra).float().reshape((1,1,spectra.size()[0]))
-    # Calculate and unnormalize steller parameter predictions
-    normalized_prediction = model(normalized_spectra.to(device))
-    prediction = unnormalize_predictions(normalized_prediction)
-    prediction = prediction.squeeze()
-    # Unpack stellar parameters
-    log_G = prediction[0].item()
-    log_Teff = prediction[1].item()
-    FeH = prediction[2].item()
+    normalized_spectra = log_scale_flux(spectra).reshape((1,1,spectra.size()[0]))
 
     # Get batch of noised spectra
     uncertainties_batch = create_uncertainties_batch(spectra,error, num_uncertainty_draws)
     # scale sprectra
-    normalized_uncertainties_batch = log_scale_flux(uncertainties_batch).float()
+    normalized_uncertainties_batch = log_scale_flux(uncertainties_batch)
     x=normalized_uncertainties_batch.shape
     normalized_uncertainties_batch=normalized_uncertainties_batch.reshape((x[0],1,x[1]))
-    # Calculate and unnormalize stellar parameters predictions
-    normalized_predictions_batch = model(normalized_uncertainties_batch.to(device))
-    prediction = unnormalize_predictions(normalized_predictions_batch)
-    # Calculate the median and std for each stellar parameter
-    median = torch.median(prediction, axis=0)[0]
-    std = torch.std(prediction, axis=0)
-    # Unpack medians
-    log_G_median = median[0].item()
-    log_Teff_median = median[1].item()
-    Feh_median = median[2].item()
-    # Unpack stds
-    log_G_std = std[0].item()
-    log_Teff_std = std[1].item()
-    Feh_std = std[2].item()
+
+    # Calculate and unnormalize stellar parameter predictions for the spectrum and the noised 
+    # spectra in a single forward pass.
+    # With `mixed_precision`, the network runs in bfloat16 but the outputs are unnormalized in float32.
+    with torch.inference_mode():
+        with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=mixed_precision):
+            normalized_predictions = model(
+                torch.cat((normalized_spectra, normalized_uncertainties_batch)).to(device)
+            )
+        predictions = unnormalize_predictions(normalized_predictions.float())
+
+    # Unpack stellar parameters
+    log_G, log_Teff, FeH = predictions[0].tolist()
+
+    # Calculate the std for each stellar parameter, and unpack with a single device transfer.
+    log_G_std, log_Teff_std, Feh_std = torch.std(predictions[1:], axis=0).tolist()
 
     return log_G,log_Teff,FeH,log_G_std,log_Teff_std,Feh_std
 
@@ -253,15 +265,18 @@ def reverse_inverse_error(inverse_error: np.array, default_error: int) -> np.arr
     with a default error value or a multiple of the median non-infinite value in the array. The resulting array is returned
     as a numpy array.
     """
-    np.seterr(all="ignore")
-    inverse_error = np.nan_to_num(inverse_error)
-    error = np.divide(1, inverse_error) ** 0.5
-    if np.isinf(error).all():
-        error = np.ones(*error.shape) * default_error
-        error = error.astype(inverse_error.dtype)
-    median_error = np.nanmedian(error[error != np.inf])
-    error = np.clip(error, a_min=None, a_max=5 * median_error)
-    error = np.where(np.isnan(error), 5 * median_error, error)
+    inverse_error = np.asarray(inverse_error)
+    # Only strictly positive inverse errors give a finite error; everything else (zero, negative,
+    # NaN) is a bad pixel. Building this mask once avoids re-scanning the array for inf and NaN.
+    good = inverse_error > 0
+    if not good.any():
+        return np.full(inverse_error.shape, default_error, dtype=inverse_error.dtype)
+
+    error = np.empty_like(inverse_error)
+    error[good] = inverse_error[good] ** -0.5
+    max_error = 5 * np.median(error[good])
+    error[~good] = max_error
+    np.minimum(error, max_error, out=error)
     return error
 
 from astra import task
@@ -274,6 +289,25 @@ from typing import Optional, Iterable, Union
 
 
 
+@lru_cache
+def read_model(model_path, device):
+    """
+    Read the APOGEENet model once per process, and move it to the given device.
+
+    :param model_path:
+        The directory containing the model chunks.
+
+    :param device:
+        The `torch.device` to put the model on.
+    """
+    model = BossNet()
+    state_dict = franken_load(expand_path(model_path), 10)
+    model.load_state_dict(state_dict, strict=False)
+    model.eval()
+    # As per https://stackoverflow.com/questions/59013109/runtimeerror-input-type-torch-floattensor-and-weight-type-torch-cuda-floatte
+    return model.to(device)
+
+
 @task
 def apogeenet(
     spectra: Optional[Iterable[Union[ApogeeVisitSpectrumInApStar, ApogeeCoaddedSpectrumInApStar]]] = (
@@ -284,25 +318,28 @@ def apogeenet(
     ),
     num_uncertainty_draws: Optional[int] = 20,
     limit=None,
+    compile_model: Optional[bool] = False,
+    mixed_precision: Optional[bool] = False,
     **kwargs
 ) -> Iterable[ApogeeNet]:
     """
     Run the ANet (APOGEENet III) pipeline.
-    
+
+    :param compile_model: [optional]
+        Compile the network with `torch.compile` so that convolution and activation kernels can be
+        fused. This adds a one-off compilation cost, so it is only worthwhile for many spectra.
+
+    :param mixed_precision: [optional]
+        Run the network in bfloat16 with `torch.autocast`. This is faster on hardware with tensor
+        cores, at some cost in precision of the predicted stellar parameters.
     """
     
     
-    model = BossNet()
-    model_path = expand_path("$MWM_ASTRA/pipelines/ANet/deconstructed_model")
-    state_dict = franken_load(model_path, 10)
-    model.load_state_dict(state_dict, strict=False)
-    model.eval()
-
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    model = read_model("$MWM_ASTRA/pipelines/ANet/deconstructed_model", device)
 
-    # As per https://stackoverflow.com/questions/59013109/runtimeerror-input-type-torch-floattensor-and-weight-type-torch-cuda-floatte
-    if torch.cuda.is_available():
-        model.cuda()
+    if compile_model:
+        model = torch.compile(model)
     
     if isinstance(spectra, ModelSelect):
         if limit is not None:
@@ -313,13 +350,13 @@ def apogeenet(
     for spectrum in tqdm(spectra, total=0):
         
         try:        
-            flux = np.nan_to_num(spectrum.flux, nan=0.0).astype(np.float32)
+            flux = np.nan_to_num(spectrum.flux.astype(np.float32), nan=0.0, copy=False)
             e_flux = reverse_inverse_error(spectrum.ivar, 0.1 * np.median(flux)).astype(np.float32) # TODO: do as per how BOSSNet does it?
             
-            flux = torch.from_numpy(flux).float()
-            e_flux = torch.from_numpy(e_flux).float()
+            flux = torch.from_numpy(flux)
+            e_flux = torch.from_numpy(e_flux)
             
-            log_G,log_Teff,FeH,log_G_std,log_Teff_std,Feh_std = make_prediction(flux, e_flux, None, num_uncertainty_draws,model,device)
+            log_G,log_Teff,FeH,log_G_std,log_Teff_std,Feh_std = make_prediction(flux, e_flux, None, num_uncertainty_draws,model,device,mixed_precision)
         except:
             log.exception(f"Exception when running ApogeeNet on {spectrum}")    
             yield ApogeeNet(
@@ -204,7 +204,7 @@ class Network:
                 with torch.inference_mode():
                     if num_full_batch > 0:
                         for i in range(num_full_batch):
-                            batch_inputs = torch.tensor(inputs[i * batchsize : (i + 1) * batchsize] - input_mean, **self.factory_kwargs)[:, :, None]
+                            batch_inputs = torch.as_tensor(inputs[i * batchsize : (i + 1) * batchsize] - input_mean, **self.factory_kwargs)[:, :, None]
                             temp_outputs = [self(batch_inputs) for i in range(mc_num)]
 
                             mc_dropout_var = torch.var(torch.stack([i[0] for i in temp_outputs]), dim=0)
@@ -215,7 +215,7 @@ class Network:
                             outputs_std_holder[i * batchsize : (i + 1) * batchsize] = outputs_std.cpu().numpy()
                             pbar.update(batchsize)
                     if num_data_remaining > 0:
-                        batch_inputs = torch.tensor(inputs[-num_data_remaining:] - input_mean, **self.factory_kwargs)[:, :, None]
+                        batch_inputs = torch.as_tensor(inputs[-num_data_remaining:] - input_mean, **self.factory_kwargs)[:, :, None]
                         temp_outputs = [self(batch_inputs) for i in range(mc_num)]
 
                         mc_dropout_var = torch.var(torch.stack([i[0] for i in temp_outputs]), dim=0)
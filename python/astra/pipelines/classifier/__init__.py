@@ -1,13 +1,14 @@
 import numpy as np
 import torch
-from peewee import JOIN
+from peewee import JOIN, chunked
 from typing import Optional, Iterable
-from functools import cache
+from functools import cache, partial
+from concurrent.futures import ThreadPoolExecutor
 from astra import task
 from astra.utils import log, expand_path
 from astra.models import ApogeeVisitSpectrum, BossVisitSpectrum
 from astra.models.classifier import SpectrumClassification
-from astra.pipelines.classifier.utils import read_network, classification_result
+from astra.pipelines.classifier.utils import read_network, classification_results
 from astra.pipelines.classifier import networks
 
 SMALL = -1e+20
@@ -25,6 +26,151 @@ def read_model(model_path):
     return model
 
 
+def predict_log_probs(model, chunk):
+    """
+    Predict log probabilities for many spectra with a single forward pass.
+
+    :param model:
+        The classifier network.
+
+    :param chunk:
+        A list of `(spectrum, flux)` tuples, where all `flux` arrays have the same shape.
+
+    :returns:
+        A two-length tuple of the spectra and an array of log probabilities, one row per spectrum.
+    """
+    spectra, fluxes = zip(*chunk)
+    batch = torch.from_numpy(np.stack(fluxes))
+    if CUDA_AVAILABLE:
+        # Page-locked memory allows an asynchronous host-to-device copy.
+        batch = batch.pin_memory()
+    batch = batch.to(DEVICE, non_blocking=True)
+    with torch.inference_mode():
+        prediction = model.forward(batch)
+    return (spectra, prediction.cpu().numpy())
+
+
+def predict_log_probs_with_fallback(model, chunk):
+    """
+    Predict log probabilities for many spectra with a single forward pass, and fall back to one
+    spectrum at a time if the batched forward pass fails, so that one bad spectrum does not lose
+    the whole chunk.
+
+    :param model:
+        The classifier network.
+
+    :param chunk:
+        A list of `(spectrum, flux)` tuples, where all `flux` arrays have the same shape.
+
+    :returns:
+        A two-length tuple of the spectra that were classified and an array of their log
+        probabilities, one row per spectrum.
+    """
+    try:
+        return predict_log_probs(model, chunk)
+    except Exception:
+        log.exception(f"Exception in forward pass for {len(chunk)} spectra; predicting one at a time")
+
+    spectra, log_probs = ([], [])
+    for item in chunk:
+        try:
+            (spectrum, ), (item_log_probs, ) = predict_log_probs(model, [item])
+        except Exception:
+            log.exception(f"Exception when classifying {item[0]}")
+        else:
+            spectra.append(spectrum)
+            log_probs.append(item_log_probs)
+    return (spectra, np.array(log_probs))
+
+
+def prepare_in_chunks(prepare, spectra, batch_size, max_workers=8):
+    """
+    Prepare spectra in chunks using a pool of threads.
+
+    The next chunk of spectra is read while the caller is processing the current chunk, so that
+    disk I/O overlaps with inference.
+
+    :param prepare:
+        A callable that takes a spectrum and returns a prepared flux array, or `None` if the
+        spectrum should be skipped.
+
+    :param spectra:
+        An iterable of spectra.
+
+    :param batch_size:
+        The number of spectra per chunk.
+
+    :param max_workers: [optional]
+        The maximum number of threads used to read spectra.
+
+    :returns:
+        A generator of lists of `(spectrum, flux)` tuples.
+    """
+    def safe_prepare(spectrum):
+        # Handle errors per spectrum in the worker, so that one bad file cannot empty a chunk.
+        try:
+            return prepare(spectrum)
+        except Exception:
+            log.exception(f"Exception when preparing {spectrum}")
+            return None
+
+    def collect(futures):
+        chunk = []
+        for spectrum, future in futures:
+            flux = future.result()
+            if flux is not None:
+                chunk.append((spectrum, flux))
+        return chunk
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = None
+        for spectra_chunk in chunked(spectra, batch_size):
+            next_futures = [(spectrum, executor.submit(safe_prepare, spectrum)) for spectrum in spectra_chunk]
+            if futures is not None:
+                yield collect(futures)
+            futures = next_futures
+        if futures is not None:
+            yield collect(futures)
+
+
+def _prepare_apogee_visit_spectrum(spectrum, expected_shape):
+    if not spectrum.dithered:
+        existing_flux = spectrum.flux.reshape((3, -1))
+        flux = np.empty(expected_shape)
+        for j in range(3):
+            flux[j, ::2] = existing_flux[j]
+            flux[j, 1::2] = existing_flux[j]   
+    else:
+        flux = spectrum.flux.reshape(expected_shape)
+    
+    continuum = np.nanmedian(flux, axis=1)
+    batch = flux / continuum.reshape((-1, 1))
+    return batch.astype(np.float32)
+
+
+def _prepare_boss_visit_spectrum(spectrum, si, ei):
+    flux = spectrum.flux[si:ei]
+    # Reject short spectra here, otherwise they break stacking the whole chunk.
+    if flux.shape != (ei - si, ):
+        log.warning(f"Skipping {spectrum} because it has {flux.size} pixels in [{si}, {ei}), not {ei - si}")
+        return None
+    continuum = np.nanmedian(flux)
+    batch = flux / continuum
+    # remove nans
+    finite = np.isfinite(batch)
+    if not any(finite):
+        log.warning(f"Skipping {spectrum} because all values are NaN")
+        return None
+
+    if any(~finite):
+        batch[~finite] = np.interp(
+            spectrum.wavelength.value[si:ei][~finite],
+            spectrum.wavelength.value[si:ei][finite],
+            batch[finite],
+        )        
+    return batch.reshape((1, -1)).astype(np.float32)
+
+
 @task
 def classify_apogee_visit_spectrum(
     spectra: Optional[Iterable[ApogeeVisitSpectrum]] = (
@@ -35,6 +181,8 @@ def classify_apogee_visit_spectrum(
         .iterator()
     ),
     model_path: str = "$MWM_ASTRA/pipelines/classifier/classifier_NIRCNN_77804646.pt",
+    batch_size: int = 256,
+    max_workers: int = 8,
 ) -> Iterable[SpectrumClassification]:
     """
     Classify a source, given an APOGEE visit spectrum (an apVisit data product).
@@ -45,36 +193,24 @@ def classify_apogee_visit_spectrum(
     model = read_model(model_path)
     log.info(f"Making predictions..")
 
-    for spectrum in spectra:
-        try:                
-            if not spectrum.dithered:
-                existing_flux = spectrum.flux.reshape((3, -1))
-                flux = np.empty(expected_shape)
-                for j in range(3):
-                    flux[j, ::2] = existing_flux[j]
-                    flux[j, 1::2] = existing_flux[j]   
-            else:
-                flux = spectrum.flux.reshape(expected_shape)
-            
-            continuum = np.nanmedian(flux, axis=1)
-            batch = flux / continuum.reshape((-1, 1))
-            batch = batch.reshape((-1, *expected_shape)).astype(np.float32)
-            batch = torch.from_numpy(batch).to(DEVICE)
-
-            with torch.no_grad():
-                prediction = model.forward(batch)
-
-            # Should be only one result with apVisit, but whatever..
-            for log_probs in prediction.cpu().numpy():
-                result = classification_result(log_probs, model.class_names)
-                yield SpectrumClassification(
-                    spectrum_pk=spectrum.spectrum_pk,
-                    source_pk=spectrum.source_pk,
-                    **result
-                )
-        except:
-            # TODO: yield a record with no result?
-            None
+    prepare = partial(_prepare_apogee_visit_spectrum, expected_shape=expected_shape)
+    for chunk in prepare_in_chunks(prepare, spectra, batch_size, max_workers):
+        if not chunk:
+            continue
+        chunk_spectra, chunk_log_probs = predict_log_probs_with_fallback(model, chunk)
+        if not chunk_spectra:
+            continue
+
+        # The forward pass is shared by the whole chunk, so count it as overhead.
+        yield ...
+
+        chunk_results = classification_results(chunk_log_probs, model.class_names)
+        for spectrum, result in zip(chunk_spectra, chunk_results):
+            yield SpectrumClassification(
+                spectrum_pk=spectrum.spectrum_pk,
+                source_pk=spectrum.source_pk,
+                **result
+            )
 
 
 @task
@@ -87,6 +223,8 @@ def classify_boss_visit_spectrum(
         .iterator()
     ),
     model_path: str = "$MWM_ASTRA/component_data/classifier/classifier_OpticalCNN_40bb9164.pt",
+    batch_size: int = 256,
+    max_workers: int = 8,
 ) -> Iterable[SpectrumClassification]:
     """
     Classify a source, given a BOSS visit spectrum.
@@ -97,40 +235,23 @@ def classify_boss_visit_spectrum(
     si, ei = (0, 3800)  # MAGIC: same done in training
     log.info(f"Making predictions")
 
-    for spectrum in spectra:
-        try:
-            flux = spectrum.flux[si:ei]
-            continuum = np.nanmedian(flux)
-            batch = flux / continuum
-            # remove nans
-            finite = np.isfinite(batch)
-            if not any(finite):
-                log.warning(f"Skipping {spectrum} because all values are NaN")
-                continue
-
-            if any(~finite):
-                batch[~finite] = np.interp(
-                    spectrum.wavelength.value[si:ei][~finite],
-                    spectrum.wavelength.value[si:ei][finite],
-                    batch[finite],
-                )        
-            batch = batch.reshape((1, 1, -1)).astype(np.float32)
-            batch = torch.from_numpy(batch).to(DEVICE)
-
-            with torch.no_grad():
-                prediction = model.forward(batch)
-
-            # Should be only one result with specFull, but whatever..
-            for log_probs in prediction.cpu().numpy():
-                result = classification_result(log_probs, model.class_names)
-                yield SpectrumClassification(
-                    spectrum_pk=spectrum.spectrum_pk,
-                    source_pk=spectrum.source_pk,
-                    **result
-                )
-        except:
-            # TODO: yield a record with no result?
-            None
+    prepare = partial(_prepare_boss_visit_spectrum, si=si, ei=ei)
+    for chunk in prepare_in_chunks(prepare, spectra, batch_size, max_workers):
+        if not chunk:
+            continue
+        chunk_spectra, chunk_log_probs = predict_log_probs_with_fallback(model, chunk)
+        if not chunk_spectra:
+            continue
 
-    log.info("Done")
+        # The forward pass is shared by the whole chunk, so count it as overhead.
+        yield ...
 
+        chunk_results = classification_results(chunk_log_probs, model.class_names)
+        for spectrum, result in zip(chunk_spectra, chunk_results):
+            yield SpectrumClassification(
+                spectrum_pk=spectrum.spectrum_pk,
+                source_pk=spectrum.source_pk,
+                **result
+            )
+
+    log.info("Done")
@@ -257,12 +257,16 @@ def predict_classes(network, spectra):
     """
     Predict an object class given a trained network and some spectra.
     """
-    net = torch.load(model_path)
-    batch = torch.Tensor(spectra)
-    # if CUDA_AVAILABLE:
-    #    batch = batch.cuda()
-
-    pred = net.forward(Variable(batch))
-    _, preds = torch.max(pred.data.cpu(), 1)
+    # Use whichever device the network is on; it is not necessarily the module-level `device`.
+    network_device = next(network.parameters()).device
+    batch = torch.from_numpy(np.ascontiguousarray(spectra, dtype=np.float32))
+    if network_device.type == "cuda":
+        # Copy to page-locked memory so the host-to-device transfer can be asynchronous.
+        batch = batch.pin_memory()
+    batch = batch.to(network_device, non_blocking=True)
+
+    with torch.inference_mode():
+        pred = network.forward(batch)
+    _, preds = torch.max(pred.cpu(), 1)
 
     return preds.numpy()
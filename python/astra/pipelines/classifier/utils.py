@@ -32,6 +32,40 @@ def classification_result(log_probs, class_names=None, decimals=30):
     result[f"flag_most_likely_{class_names[np.argmax(probs)]}"] = True
     return result
 
+def classification_results(log_probs, class_names, decimals=30):
+    """
+    Calculate classification results for many spectra at once.
+
+    :param log_probs:
+        An array of log probabilities with shape `(N, C)` for `N` spectra and `C` classes.
+
+    :param class_names:
+        The names of the `C` classes.
+
+    :returns:
+        A list of `N` dictionaries, in the same format as `classification_result`.
+    """
+    log_probs = np.atleast_2d(log_probs)
+    with np.errstate(under="ignore"):
+        relative_log_probs = log_probs - logsumexp(log_probs, axis=1, keepdims=True)
+
+    # Round for PostgreSQL 'real' type (see `classification_result`).
+    probs = np.round(np.exp(relative_log_probs), decimals)
+    log_probs = np.round(log_probs, decimals)
+    most_likely = np.argmax(probs, axis=1)
+
+    p_keys = [f"p_{cn}" for cn in class_names]
+    lp_keys = [f"lp_{cn}" for cn in class_names]
+    flag_keys = [f"flag_most_likely_{cn}" for cn in class_names]
+    results = []
+    for p, lp, index in zip(probs.tolist(), log_probs.tolist(), most_likely):
+        result = dict(zip(p_keys, p))
+        result.update(zip(lp_keys, lp))
+        result[flag_keys[index]] = True
+        results.append(result)
+    return results
+
+
 def load_data(spectra_path, labels_path):
     """
     Load data for training, testing, or validation.
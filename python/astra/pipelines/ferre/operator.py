@@ -733,9 +733,9 @@ def monitor(
                     continue
                 
                 absolute_path = expand_path(output_path)
-                if os.path.exists(absolute_path):
+                try:
                     n_now_done = wc(absolute_path)
-                else:
+                except FileNotFoundError:
                     n_now_done = 0
                 n_new = n_now_done - n_done
                 n_done_this_iteration += n_new
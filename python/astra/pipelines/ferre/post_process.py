@@ -208,6 +208,27 @@ def post_process_ferre(dir, pwd=None, skip_pixel_arrays=False, **kwargs) -> Iter
     for index in frozen_indices:
         common[f"flag_{parameter_names[index - 1]}_frozen"] = True
 
+    # Replace sentinel values for all spectra at once, instead of per spectrum and per parameter.
+    with np.errstate(invalid="ignore"):
+        is_bad_e_parameter = (e_parameters <= 0) | (e_parameters >= 9999)
+        is_bad_parameter = (parameters >= 9999) | (parameters <= -9999)
+    is_bad_parameter[:, [j for j, parameter in enumerate(parameter_names) if parameter == "teff"]] = False
+    flag_ferre_fail |= is_bad_e_parameter | is_bad_parameter # TODO: should we have more specific flags here?
+    parameters = np.where(is_bad_parameter, np.nan, parameters)
+    e_parameters = np.where(is_bad_e_parameter, np.nan, e_parameters)
+    rchi2 = 10**ferre_log_chi_sq
+
+    parameter_columns = []
+    for j, parameter in enumerate(parameter_names):
+        parameter_columns.extend([
+            (f"initial_{parameter}", input_parameters[:, j]),
+            (parameter, parameters[:, j]),
+            (f"e_{parameter}", e_parameters[:, j]),
+            (f"flag_{parameter}_ferre_fail", flag_ferre_fail[:, j]),
+            (f"flag_{parameter}_grid_edge_bad", flag_grid_edge_bad[:, j]),
+            (f"flag_{parameter}_grid_edge_warn", flag_grid_edge_warn[:, j]),
+        ])
+
     ndim = int(control_kwds["NDIM"])
     for i, name in enumerate(input_names):
         name_meta = parse_ferre_spectrum_name(name)
@@ -221,8 +242,8 @@ def post_process_ferre(dir, pwd=None, skip_pixel_arrays=False, **kwargs) -> Iter
             ferre_name=name,
             ferre_input_index=name_meta["index"],
             ferre_output_index=i,
-            rchi2=10**ferre_log_chi_sq[i], 
-            penalized_rchi2=10**ferre_log_chi_sq[i],     
+            rchi2=rchi2[i], 
+            penalized_rchi2=rchi2[i],     
             ferre_log_snr_sq=ferre_log_snr_sq[i],
             flag_ferre_fail=flag_any_ferre_fail[i],
             flag_potential_ferre_timeout=flag_potential_ferre_timeout[i],
@@ -256,27 +277,7 @@ def post_process_ferre(dir, pwd=None, skip_pixel_arrays=False, **kwargs) -> Iter
             )
         '''
 
-        for j, parameter in enumerate(parameter_names):
-
-            value = parameters[i, j]
-            e_value = e_parameters[i, j]
-
-            if e_value <= 0 or e_value >= 9999:
-                e_value = np.nan
-                flag_ferre_fail[i, j] = True # TODO: should we have more specific flags here?
-            
-            if parameter != "teff" and (value >= 9999 or value <= -9999):
-                value = np.nan
-                flag_ferre_fail[i, j] = True
-                
-            result.update({
-                f"initial_{parameter}": input_parameters[i, j],
-                parameter: value,
-                f"e_{parameter}": e_value,
-                f"flag_{parameter}_ferre_fail": flag_ferre_fail[i, j],
-                f"flag_{parameter}_grid_edge_bad": flag_grid_edge_bad[i, j],
-                f"flag_{parameter}_grid_edge_warn": flag_grid_edge_warn[i, j],
-            })
+        result.update((key, column[i]) for key, column in parameter_columns)
 
         # TODO: Load metadata from dir/meta.json (e.g., pre-continuum steps)
         # TODO: Include correlation coefficients?
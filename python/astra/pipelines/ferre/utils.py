@@ -8,6 +8,8 @@ import subprocess
 from typing import Optional
 from tqdm import tqdm
 from glob import glob
+from copy import deepcopy
+from functools import lru_cache
 from itertools import cycle
 from astra.utils import log, expand_path
 
@@ -103,6 +105,10 @@ def get_apogee_segment_indices():
 
 def get_apogee_pixel_mask():
     # TODO: put elsewhere?
+    return _get_apogee_pixel_mask().copy()
+
+@lru_cache(maxsize=1)
+def _get_apogee_pixel_mask():
     mask = np.zeros(8575, dtype=bool)
     for si, p in zip(*get_apogee_segment_indices()):
         mask[si:si+p] = True
@@ -183,7 +189,13 @@ def parse_header_path(header_path):
     :returns:
         A dictionary of keywords that are relevant to running FERRE tasks.
     """
+    # This is called once per spectrum per grid when matching initial guesses, so the parsing is
+    # memoized. Return a copy so that callers cannot change the cached result.
+    return dict(_parse_header_path(header_path))
+
 
+@lru_cache(maxsize=None)
+def _parse_header_path(header_path):
     (
         *_,
         radiative_transfer_code,
@@ -813,16 +825,20 @@ def read_ferre_headers(path):
        libstr0, libstr : first header, then list of extension headers; headers returned as dictionaries
     """
 
-    try:
-        with open(path, "r") as fp:
-            headers = [read_ferre_header(fp)]
-            headers[0]["PATH"] = path
-            for i in range(headers[0].get("MULTI", 0)):
-                headers.append(read_ferre_header(fp))
-    except:
-        raise
-    else:
-        return headers
+    # Grid headers are re-read by every stage that plans or post-processes FERRE executions, so
+    # they are cached per process. Return copies so that callers cannot change the cached headers.
+    headers = deepcopy(_read_ferre_headers(os.path.abspath(path)))
+    headers[0]["PATH"] = path
+    return headers
+
+
+@lru_cache(maxsize=32)
+def _read_ferre_headers(path):
+    with open(path, "r") as fp:
+        headers = [read_ferre_header(fp)]
+        for i in range(headers[0].get("MULTI", 0)):
+            headers.append(read_ferre_header(fp))
+    return headers
 
 
 def validate_initial_and_frozen_parameters(
@@ -1089,8 +1105,21 @@ def read_control_file(path):
     return meta
 
 
-def wc(path):
-    return int(subprocess.check_output(["wc", "-l", path]).split()[0])
+def wc(path, block_size=1 << 20):
+    """
+    Count the number of lines in a file (like `wc -l`), without spawning a process.
+
+    :param path:
+        The path to the file.
+
+    :param block_size: [optional]
+        The number of bytes to read at a time.
+    """
+    n = 0
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(block_size), b""):
+            n += block.count(b"\n")
+    return n
 
 
 def parse_ferre_output(dir, stdout, stderr, control_file_basename="input.nml"):
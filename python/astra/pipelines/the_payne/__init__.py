@@ -53,10 +53,13 @@ def the_payne(
         )
     ]
 
+    # Construct the continuum model once: this loads the continuum mask from disk.
+    if continuum_method is not None:
+        f_continuum = executable(continuum_method)(**continuum_kwargs)
+
     for spectrum in spectra:
         try:
             if continuum_method is not None:
-                f_continuum = executable(continuum_method)(**continuum_kwargs)
                 continuum = np.atleast_2d(f_continuum.fit(spectrum))
             else:
                 continuum = None            
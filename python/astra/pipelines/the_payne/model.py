@@ -1,11 +1,11 @@
 import numpy as np
-from scipy.optimize import curve_fit
+import threading
+from scipy.optimize import least_squares
 from astropy.constants import c
 from astropy import units as u
 from astropy.nddata import StdDevUncertainty
 from astra.utils import log
 from typing import Union, Tuple, Optional
-from collections import OrderedDict
 
 SPEED_OF_LIGHT = c.to("km/s").value
 
@@ -45,11 +45,10 @@ def estimate_labels(
     if initial_labels is None:
         initial_labels = np.zeros(L)
 
-    bounds = np.zeros((2, L))
-    bounds[0, :] = -0.5
-    bounds[1, :] = +0.5
+    lower_bounds, upper_bounds = (np.full(L, -0.5), np.full(L, +0.5))
     if fit_v_rad:
-        bounds[:, -1] = [-abs(v_rad_tolerance), +abs(v_rad_tolerance)]
+        lower_bounds[-1], upper_bounds[-1] = (-abs(v_rad_tolerance), +abs(v_rad_tolerance))
+    bounds = (lower_bounds, upper_bounds)
 
     N, P = np.atleast_2d(spectrum.flux).shape
 
@@ -58,12 +57,47 @@ def estimate_labels(
     model_flux = np.empty((N, P))
     meta = []
 
+    # The Jacobian is evaluated right after the residuals at the same labels, so keep
+    # the last forward pass (and its activation derivatives) to share between them.
+    last = dict(labels=None)
+    buffers = _get_buffers(weights)
+
+    def forward(labels):
+        if last["labels"] is None or not np.array_equal(last["labels"], labels):
+            last.update(
+                labels=np.array(labels),
+                forward=_forward(labels[:K], weights, biases, buffers)
+            )
+        return last["forward"]
+
     def objective_function(x, *labels):
-        y_pred = predict_stellar_spectrum(labels[:K], weights, biases)
+        y_pred, *_ = forward(labels)
         if fit_v_rad:
             y_pred = redshift_spectrum(x, y_pred, labels[-1])
         return y_pred
 
+    def jacobian(x, *labels):
+        y_pred, d_inside, d_outside = forward(labels)
+        J = _jacobian(weights, d_inside, d_outside)
+        if fit_v_rad:
+            v_rad = labels[-1]
+            J = redshift_spectrum(x, J, v_rad)
+            # The radial velocity derivative is taken numerically.
+            h = 6e-6 * max(1, abs(v_rad))
+            upper, lower = redshift_spectrum(x, y_pred, [v_rad + h, v_rad - h])
+            dv = (upper - lower) / (2 * h)
+            J = np.hstack([J, dv[:, None]])
+        return J
+
+    def residuals(labels, flux, inv_sigma):
+        # Not in place: the forward pass may be cached.
+        y_pred = objective_function(model_wavelength, *labels) - flux
+        y_pred *= inv_sigma
+        return y_pred
+
+    def residual_jacobian(labels, flux, inv_sigma):
+        return jacobian(model_wavelength, *labels) * inv_sigma[:, None]
+
     wavelength = spectrum.wavelength
     all_flux = np.atleast_2d(spectrum.flux)
     all_ivar = np.atleast_2d(spectrum.ivar)
@@ -90,47 +124,66 @@ def estimate_labels(
     if (parent_data_product_id is None or len(parent_data_product_id) == 0) and data_product is not None:
         parent_data_product_id = [data_product.id] * N
     '''
+    # Spectra are often already sampled on the model wavelengths, and then we need not
+    # interpolate at all. Otherwise, every spectrum shares the same wavelengths, so work
+    # out the interpolation onto the model wavelengths once, for both flux and ivar.
+    same_wavelengths = (
+        wavelength.shape == model_wavelength.shape
+        and np.allclose(wavelength, model_wavelength, rtol=1e-7, atol=0)
+    )
+    if not same_wavelengths:
+        interpolant = _linear_interpolant(model_wavelength, wavelength)
+        outside = (model_wavelength < wavelength[0]) | (model_wavelength > wavelength[-1])
+
     results = []
     meta_results = []
+    fitted = []
     kwds = kwargs.copy()
     for i in range(N):
 
         # Interpolate data onto model wavelengths -- not The Right Thing to do!
-        flux = np.interp(model_wavelength, wavelength, all_flux[i], left=1, right=1)
-        ivar = np.interp(
-            model_wavelength, wavelength, all_ivar[i], left=0, right=0
-        )
+        if same_wavelengths:
+            flux, ivar = (np.array(all_flux[i], dtype=float), np.array(all_ivar[i], dtype=float))
+        else:
+            flux = _interpolate(interpolant, all_flux[i])
+            flux[outside] = 1
+            ivar = _interpolate(interpolant, all_ivar[i])
+            ivar[outside] = 0
         ivar[mask] = 0
 
         # Fix non-finite pixels and error values.
-        non_finite = ~np.isfinite(flux) + ~np.isfinite(ivar) + (ivar <= 0)
-        flux[non_finite] = 1
-        ivar[non_finite] = 0
+        non_finite = ivar > 0
+        non_finite &= np.isfinite(ivar)
+        non_finite &= np.isfinite(flux)
+        np.logical_not(non_finite, out=non_finite)
+        np.copyto(flux, 1, where=non_finite)
+        np.copyto(ivar, 0, where=non_finite)
 
         # "normalize"
         scale = np.median(flux)
         flux /= scale
         ivar *= scale**2
         
-        sigma = ivar**-0.5
-        sigma[non_finite] = LARGE
+        # Weight the residuals by the inverse uncertainty, computed once per spectrum.
+        inv_sigma = np.sqrt(ivar)
+        inv_sigma[non_finite] = 1 / LARGE
 
         kwds.update(
-            xdata=model_wavelength,
-            ydata=flux,
-            sigma=sigma,
-            p0=initial_labels,
+            x0=initial_labels,
+            args=(flux, inv_sigma),
+            jac=residual_jacobian,
             bounds=bounds,
-            absolute_sigma=True,
             method="trf",
+            x_scale="jac",
             xtol=opt_tolerance,
             ftol=opt_tolerance,
-    )
+            gtol=opt_tolerance,
+        )
 
-        result = OrderedDict([])
+        result = {}
 
         try:
-            p_opt, p_cov = curve_fit(objective_function, **kwds)
+            p_opt, p_cov = _fit(residuals, **kwds)
 
         except ValueError:
             log.exception(f"Error occurred fitting spectrum {i}:")
@@ -138,16 +191,14 @@ def estimate_labels(
             result.update(dict(zip([f"e_{ln}" for ln in label_names], [np.nan] * len(label_names))))
             for j, k in zip(*np.triu_indices(L, 1)):
                 result[f"rho_{label_names[j]}_{label_names[k]}"] = np.nan
-            result.update(OrderedDict([
-                    ("chi_sq", np.nan),
-                    ("reduced_chi_sq", np.nan),
-                    ("bitmask_flag", 1), # TODO: bitmask flag definitions
-                ])
+            result.update(
+                chi_sq=np.nan,
+                reduced_chi_sq=np.nan,
+                bitmask_flag=1, # TODO: bitmask flag definitions
             )
             
-            meta = OrderedDict([("model_flux", np.nan * np.ones_like(flux))])
+            meta = {"model_flux": np.nan * np.ones_like(flux)}
             if continuum is not None:
-                resampled_model_flux *= continuum[i]
                 meta["continuum"] = continuum[i]
             
             results.append(result)
@@ -164,45 +215,221 @@ def estimate_labels(
             for j, k in zip(*np.triu_indices(L, 1)):
                 result[f"rho_{label_names[j]}_{label_names[k]}"] = rho[j, k]
 
+            results.append(result)
+            meta_results.append(None)
+            fitted.append((i, flux, ivar, p_opt))
+
+    if fitted:
+        # Evaluate the network for all fitted spectra at once.
+        indices, fluxes, ivars, p_opts = zip(*fitted)
+        p_opts = np.array(p_opts)
+        model_fluxes = predict_stellar_spectrum(p_opts[:, :K].T, weights, biases).T
+
+        for i, flux, ivar, p_opt, model_flux in zip(indices, fluxes, ivars, p_opts, model_fluxes):
+            if fit_v_rad:
+                model_flux = redshift_spectrum(model_wavelength, model_flux, p_opt[-1])
+
             # Interpolate model_flux back onto the observed wavelengths.
-            model_flux = objective_function(model_wavelength, *p_opt)
-            resampled_model_flux = np.interp(
-                wavelength, model_wavelength, model_flux, left=np.nan, right=np.nan
-            )
+            if same_wavelengths:
+                resampled_model_flux = np.array(model_flux, dtype=float)
+            else:
+                resampled_model_flux = np.interp(
+                    wavelength, model_wavelength, model_flux, left=np.nan, right=np.nan
+                )
             chi2 = np.sum(((model_flux - flux)** 2 * ivar))
             reduced_chi2 = chi2 / (np.sum(ivar > 0) - L - 1)
-            result.update(
-                OrderedDict([
-                    ("chi2", chi2),
-                    ("reduced_chi2", reduced_chi2),
-                    ("bitmask_flag", 0), # TODO: bitmask flag definitions
-                ])
+            results[i].update(
+                chi2=chi2,
+                reduced_chi2=reduced_chi2,
+                bitmask_flag=0, # TODO: bitmask flag definitions
             )
-            meta = OrderedDict([("rectified_model_flux", resampled_model_flux)])
+            meta = {"rectified_model_flux": resampled_model_flux}
             if continuum is not None:
                 #resampled_model_flux *= continuum[i]
                 meta["continuum"] = continuum[i]
             else:
                 meta["continuum"] = np.ones_like(resampled_model_flux)
-            
-            results.append(result)
-            meta_results.append(meta)
+            meta_results[i] = meta
 
     return (results, meta_results)
 
 
-def leaky_relu(z):
-    return z * (z > 0) + 0.01 * z * (z < 0)
+def _fit(residuals, **kwargs):
+    """
+    Minimize the weighted residuals with `scipy.optimize.least_squares`, and return the
+    optimized parameters and their covariance matrix, as `curve_fit` would with
+    `absolute_sigma=True`.
+    """
+    res = least_squares(residuals, **kwargs)
+    if not res.success:
+        raise RuntimeError(f"Optimal parameters not found: {res.message}")
+
+    # Do Moore-Penrose inverse discarding zero singular values.
+    _, s, VT = np.linalg.svd(res.jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(res.jac.shape) * s[0]
+    s = s[s > threshold]
+    VT = VT[:s.size]
+    p_cov = np.dot(VT.T / s**2, VT)
+    return (res.x, p_cov)
+
+
+def leaky_relu(z, out=None):
+    # Scale only the negative entries, in place when out is z, so the only temporary
+    # is the boolean mask.
+    if out is None:
+        out = np.array(z)
+    elif out is not z:
+        np.copyto(out, z)
+    return np.multiply(out, 0.01, out=out, where=out < 0)
 
 
 def predict_stellar_spectrum(unscaled_labels, weights, biases):
-    inside = np.einsum("ij,j->i", weights[0], unscaled_labels) + biases[0]
-    outside = np.einsum("ij,j->i", weights[1], leaky_relu(inside)) + biases[1]
-    return np.einsum("ij,j->i", weights[2], leaky_relu(outside)) + biases[2]
+    """
+    Predict the stellar spectrum given the (scaled) labels.
+
+    :param unscaled_labels:
+        The scaled labels, either as a vector of K labels, or as a (K, N) array
+        to predict N spectra at once.
+    """
+    # Broadcast the biases across columns when predicting many spectra.
+    b0, b1, b2 = (
+        biases if np.ndim(unscaled_labels) == 1 else [b[:, None] for b in biases]
+    )
+    # Match the precision of the weights so the products are not upcast.
+    unscaled_labels = np.asarray(unscaled_labels, dtype=weights[0].dtype)
+    inside = weights[0] @ unscaled_labels
+    inside += b0
+    leaky_relu(inside, out=inside)
+    outside = weights[1] @ inside
+    outside += b1
+    leaky_relu(outside, out=outside)
+    spectrum = weights[2] @ outside
+    spectrum += b2
+    return spectrum
+
+
+def stellar_spectrum_jacobian(unscaled_labels, weights, biases):
+    """
+    Return the derivatives of the predicted spectrum with respect to the (scaled) labels.
+
+    :param unscaled_labels:
+        The scaled labels to evaluate the network at.
+
+    :returns:
+        An array of shape (P, K) for P pixels and K labels.
+    """
+    _, d_inside, d_outside = _forward(unscaled_labels, weights, biases)
+    return _jacobian(weights, d_inside, d_outside)
+
+
+def _forward(unscaled_labels, weights, biases, buffers=None):
+    # The forward pass for a single set of labels, also returning the derivatives of
+    # the activations in each hidden layer. If `buffers` are given (see `_get_buffers`)
+    # then the outputs are written to, and only valid until the next call with, them.
+    unscaled_labels = np.asarray(unscaled_labels, dtype=weights[0].dtype)
+    if buffers is None:
+        buffers = _allocate_buffers(weights)
+    inside, outside, spectrum, d_inside, d_outside = buffers
+    np.matmul(weights[0], unscaled_labels, out=inside)
+    inside += biases[0]
+    np.multiply(inside > 0, 0.99, out=d_inside)
+    d_inside += 0.01
+    leaky_relu(inside, out=inside)
+    np.matmul(weights[1], inside, out=outside)
+    outside += biases[1]
+    np.multiply(outside > 0, 0.99, out=d_outside)
+    d_outside += 0.01
+    leaky_relu(outside, out=outside)
+    np.matmul(weights[2], outside, out=spectrum)
+    spectrum += biases[2]
+    return (spectrum, d_inside, d_outside)
+
+
+# Reusable output arrays for `_forward`, per thread and per network shape, so that the
+# optimizer does not allocate new arrays on every evaluation.
+_BUFFERS = threading.local()
+
+
+def _allocate_buffers(weights):
+    dtype = weights[0].dtype
+    layers = [np.empty(w.shape[0], dtype=dtype) for w in weights]
+    derivatives = [np.empty(w.shape[0], dtype=dtype) for w in weights[:2]]
+    return (*layers, *derivatives)
+
+
+def _get_buffers(weights):
+    pool = _BUFFERS.__dict__.setdefault("pool", {})
+    key = (weights[0].dtype, *(w.shape for w in weights))
+    try:
+        return pool[key]
+    except KeyError:
+        pool[key] = buffers = _allocate_buffers(weights)
+        return buffers
+
+
+def _jacobian(weights, d_inside, d_outside):
+    return weights[2] @ (d_outside[:, None] * ((weights[1] * d_inside) @ weights[0]))
+
+
+def _linear_interpolant(x, xp):
+    # The indices and weights to linearly interpolate values sampled at `xp` onto `x`,
+    # clamping to the edge values outside of `xp`, like np.interp.
+    index = np.searchsorted(xp, x) - 1
+    np.clip(index, 0, xp.size - 2, out=index)
+    weight = (x - xp[index]) / (xp[index + 1] - xp[index])
+    np.clip(weight, 0, 1, out=weight)
+    return (index, weight)
+
+
+def _interpolate(interpolant, fp):
+    index, weight = interpolant
+    if fp.ndim > weight.ndim:
+        weight = weight[:, None]
+    return fp[index] * (1 - weight) + fp[index + 1] * weight
+
+
+# The optimizer evaluates the model and its Jacobian at the same radial velocity,
+# so keep the interpolation indices and weights for the last one we computed.
+_REDSHIFT_CACHE = [None, None, None]
+
+
+def doppler_factor(radial_velocity):
+    """
+    Return the relativistic Doppler factor for the given radial velocity (or velocities), in km/s.
+    """
+    beta = radial_velocity / SPEED_OF_LIGHT
+    if np.all(np.abs(beta) < 1e-3):
+        # For |v| < 300 km/s the second order expansion is good to better than 1e-9.
+        return 1 - beta + 0.5 * beta * beta
+    return np.sqrt((1 - beta) / (1 + beta))
+
+
+def _redshift_interpolant(dispersion, radial_velocity):
+    cached_dispersion, cached_radial_velocity, interpolant = _REDSHIFT_CACHE
+    if cached_dispersion is dispersion and cached_radial_velocity == radial_velocity:
+        return interpolant
+
+    f = doppler_factor(radial_velocity)
+    interpolant = _linear_interpolant(f * dispersion, dispersion)
+    _REDSHIFT_CACHE[:] = [dispersion, radial_velocity, interpolant]
+    return interpolant
 
 
 def redshift_spectrum(dispersion, flux, radial_velocity):
-    f = np.sqrt(
-        (1 - radial_velocity / SPEED_OF_LIGHT) / (1 + radial_velocity / SPEED_OF_LIGHT)
-    )
-    return np.interp(f * dispersion, dispersion, flux)
+    """
+    Shift a spectrum (or the columns of a 2D array) by the given radial velocity.
+
+    :param dispersion:
+        The dispersion (wavelength) array.
+
+    :param flux:
+        The flux sampled at `dispersion`, with pixels along the first axis.
+
+    :param radial_velocity:
+        The radial velocity, in km/s. If this is an array of R velocities then a single
+        spectrum is shifted by each of them, and an array of shape (R, P) is returned.
+    """
+    if np.ndim(radial_velocity) > 0:
+        f = doppler_factor(np.asarray(radial_velocity))
+        return _interpolate(_linear_interpolant(np.outer(f, dispersion), dispersion), flux)
+    return _interpolate(_redshift_interpolant(dispersion, radial_velocity), flux)
@@ -1,3 +1,4 @@
+import os
 import pickle
 import numpy as np
 from functools import cache
@@ -16,12 +17,65 @@ def read_model(model_path):
     - `x_max`: an array containing the maximum values of each (unscaled) label
     - `label_names`: a tuple containing the label names
     - `wavelength`: an array of wavelength values for output spectra
+
+    The `model_path` can also be a `.npz` file written by `convert_model_to_npz`,
+    which is faster to load because nothing needs to be unpickled.
     """
-    with open(expand_path(model_path), "rb") as fp:
-        contents = pickle.load(fp)
+    path = expand_path(model_path)
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            contents = dict(
+                weights=tuple(data[f"weights_{i}"] for i in range(data["n_layers"])),
+                biases=tuple(data[f"biases_{i}"] for i in range(data["n_layers"])),
+                x_min=data["x_min"],
+                x_max=data["x_max"],
+                label_names=tuple(map(str, data["label_names"])),
+                wavelength=data["wavelength"],
+            )
+    else:
+        with open(path, "rb") as fp:
+            contents = pickle.load(fp)
+    # Single precision is plenty for the network, and halves the memory traffic of
+    # every matrix-vector product in the forward pass.
+    for key in ("weights", "biases"):
+        contents[key] = tuple(
+            np.ascontiguousarray(each, dtype=np.float32) for each in contents[key]
+        )
     return contents
 
 
+def convert_model_to_npz(model_path, output_path=None):
+    """
+    Convert a pickled network model to an uncompressed `.npz` file that `read_model` can load.
+
+    :param model_path:
+        The path of the pickled model.
+
+    :param output_path: [optional]
+        The path to write to. By default this is `model_path` with a `.npz` extension.
+
+    :returns:
+        The path of the `.npz` file.
+    """
+    path = expand_path(model_path)
+    with open(path, "rb") as fp:
+        contents = pickle.load(fp)
+
+    output_path = expand_path(output_path or f"{os.path.splitext(path)[0]}.npz")
+    arrays = dict(
+        n_layers=len(contents["weights"]),
+        x_min=contents["x_min"],
+        x_max=contents["x_max"],
+        label_names=np.array(contents["label_names"], dtype=str),
+        wavelength=contents["wavelength"],
+    )
+    for i, (weights, biases) in enumerate(zip(contents["weights"], contents["biases"])):
+        arrays[f"weights_{i}"] = weights
+        arrays[f"biases_{i}"] = biases
+    np.savez(output_path, **arrays)
+    return output_path
+
+
 def overlap(a, b):
     b_min, b_max = (np.min(b), np.max(b))
     return np.any((b_max >= a) & (a >= b_min))
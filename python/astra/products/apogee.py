@@ -7,6 +7,7 @@ from astra.specutils.resampling import resample, pixel_weighted_spectrum
 from astra.specutils.continuum.nmf.apogee import ApogeeNMFContinuum
 
 from astra.migrations.utils import enumerate_new_spectrum_pks
+from astra.models.base import database
 from astra.models.nmf_rectify import NMFRectify
 
 from astra.models.mwm import ApogeeCombinedSpectrum, ApogeeRestFrameVisitSpectrum
@@ -196,11 +197,13 @@ def prepare_apogee_resampled_visit_and_coadd_spectra_from_apstar(source, telesco
         visit_spectrum.continuum = visit_continuum[i]
         visit_spectra.append(visit_spectrum)
     
-    for spectrum_pk, spectrum in enumerate_new_spectrum_pks([coadd_spectrum] + visit_spectra):
-        spectrum.spectrum_pk = spectrum_pk
-    
-    coadd_spectrum.save()
-    if visit_spectra:    
-        ApogeeRestFrameVisitSpectrum.bulk_create(visit_spectra)
+    # Reserve the spectrum identifiers and write the spectra in one transaction.
+    with database.atomic():
+        for spectrum_pk, spectrum in enumerate_new_spectrum_pks([coadd_spectrum] + visit_spectra):
+            spectrum.spectrum_pk = spectrum_pk
+        
+        coadd_spectrum.save()
+        if visit_spectra:    
+            ApogeeRestFrameVisitSpectrum.bulk_create(visit_spectra)
     
     return (coadd_spectrum, visit_spectra)
@@ -8,6 +8,7 @@ from astra.specutils.resampling import resample, pixel_weighted_spectrum
 from astra.specutils.continuum.nmf.boss import BossNMFContinuum
 
 from astra.migrations.utils import enumerate_new_spectrum_pks
+from astra.models.base import database
 
 from astra import __version__
 from astra.utils import log
@@ -192,12 +193,14 @@ def prepare_boss_resampled_visit_and_coadd_spectra(source, telescope=None, run2d
         save_spectra.append(coadd_spectrum)
     save_spectra.extend(visit_spectra)
 
-    for spectrum_pk, spectrum in enumerate_new_spectrum_pks(save_spectra):
-        spectrum.spectrum_pk = spectrum_pk
-    
-    if coadd_spectrum is not None:
-        coadd_spectrum.save()
-    if visit_spectra:
-        BossRestFrameVisitSpectrum.bulk_create(visit_spectra)
+    # Reserve the spectrum identifiers and write the spectra in one transaction.
+    with database.atomic():
+        for spectrum_pk, spectrum in enumerate_new_spectrum_pks(save_spectra):
+            spectrum.spectrum_pk = spectrum_pk
+        
+        if coadd_spectrum is not None:
+            coadd_spectrum.save()
+        if visit_spectra:
+            BossRestFrameVisitSpectrum.bulk_create(visit_spectra)
             
     return (coadd_spectrum, visit_spectra)
\ No newline at end of file
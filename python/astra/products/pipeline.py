@@ -489,11 +489,9 @@ def _create_pipeline_product(
             .limit(limit)
         )
 
-        if q.count() > 1:
-            log.warning(f"More than 1 star-level result ({q.count()}) for {pipeline} and {spectrum_model} for source {source} (observatory={observatory}, instrument={instrument})")
-        
         data = { name: [] for name in fields.keys() }
-        for result in q.iterator():
+        n_results = 0
+        for n_results, result in enumerate(q.iterator(), start=1):
             for name, field in fields.items():
                 if field.model == pipeline_model:
                     value = getattr(result, name)
@@ -508,6 +506,9 @@ def _create_pipeline_product(
                     value = get_fill_value(field, fill_values)
                 data[name].append(value)
 
+        if n_results > 1:
+            log.warning(f"More than 1 star-level result ({n_results}) for {pipeline} and {spectrum_model} for source {source} (observatory={observatory}, instrument={instrument})")
+
         original_names, columns = ({}, [])
         for name, field in fields.items():
             kwds = fits_column_kwargs(field, data[name], upper=upper)
@@ -561,7 +562,7 @@ def _create_pipeline_products_for_all_sources(
     q = (
         Source
         .select()
-        .distinct()
+        .distinct(Source.pk)
         .join(pipeline_model, on=(pipeline_model.source_pk == Source.pk))
         .join(boss_spectrum_model, JOIN.LEFT_OUTER, on=(pipeline_model.spectrum_pk == boss_spectrum_model.spectrum_pk))
         .switch(pipeline_model)
@@ -725,11 +726,9 @@ old visit stuff:
             .where(hdu_where & (Source.pk == source.pk))
         )
 
-        if q.count() > 1:
-            log.warning(f"More than 1 star-level result ({q.count()}) for {pipeline} and {spectrum_model} for source {source} (observatory={observatory}, instrument={instrument})")
-        
         data = { name: [] for name in fields.keys() }
-        for result in q.iterator():
+        n_results = 0
+        for n_results, result in enumerate(q.iterator(), start=1):
             for name, field in fields.items():
                 if field.model == pipeline_model:
                     value = getattr(result, name)
@@ -746,6 +745,9 @@ old visit stuff:
                     value = get_fill_value(field, fill_values)
                 data[name].append(value)
 
+        if n_results > 1:
+            log.warning(f"More than 1 star-level result ({n_results}) for {pipeline} and {spectrum_model} for source {source} (observatory={observatory}, instrument={instrument})")
+
         original_names, columns = ({}, [])
         for name, field in fields.items():
             kwds = fits_column_kwargs(field, data[name], upper=upper)
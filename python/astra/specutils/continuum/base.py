@@ -2,6 +2,7 @@
 
 import numpy as np
 from typing import Optional, Union, Tuple, List
+from astra.utils import expand_path
 
 class Continuum:
 
@@ -32,14 +33,19 @@ class Continuum:
         return None
 
     def _initialize(self, wavelength):
+        # The same instance is re-used across many spectra, which are usually on the same
+        # wavelength grid, so only re-compute the region slices and masks when it changes.
         try:
-            self._initialized_args
+            cached_wavelength, initialized_args = self._initialized
         except AttributeError:
-            self._initialized_args = _pixel_slice_and_mask(
-                wavelength, self.regions, self.mask
-            )
-        finally:
-            return self._initialized_args
+            pass
+        else:
+            if cached_wavelength is wavelength or np.array_equal(cached_wavelength, wavelength):
+                return initialized_args
+
+        initialized_args = _pixel_slice_and_mask(wavelength, self.regions, self.mask)
+        self._initialized = (wavelength, initialized_args)
+        return initialized_args
 
 
     @property
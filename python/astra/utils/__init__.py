@@ -2,6 +2,7 @@ import os
 from sdsstools.logger import get_logger as _get_logger, StreamFormatter
 import warnings
 from importlib import import_module
+from functools import lru_cache
 from time import time
 
 def get_logger(kwargs=None):
@@ -18,6 +19,7 @@ def get_logger(kwargs=None):
 
 log = get_logger()
 
+@lru_cache(maxsize=None)
 def executable(name):
     module_name, class_name = name.rsplit(".", 1)
     module = import_module(module_name)
@@ -161,19 +163,25 @@ class Timer(object):
 
 def callable(input_callable):
     if isinstance(input_callable, str):
-        try_prefixes = ("", "astra.")
-        for prefix in try_prefixes:
-            try:                
-                module_name, func_name = (prefix + input_callable).rsplit(".", 1)
-                module = import_module(module_name)
-                return getattr(module, func_name)
-            except:
-                continue        
-        raise ImportError(f"Cannot resolve input callable `{input_callable}`")
+        return _resolve_callable(input_callable)
     else:
         return input_callable
 
 
+@lru_cache(maxsize=None)
+def _resolve_callable(name):
+    # Names are resolved often (and failed imports are slow), so remember them.
+    try_prefixes = ("", "astra.")
+    for prefix in try_prefixes:
+        try:                
+            module_name, func_name = (prefix + name).rsplit(".", 1)
+            module = import_module(module_name)
+            return getattr(module, func_name)
+        except:
+            continue        
+    raise ImportError(f"Cannot resolve input callable `{name}`")
+
+
     
 def expand_path(path):
     """
@@ -214,22 +222,28 @@ def flatten(struct):
         >>> flatten(42)
         [42]
     """
-    if struct is None:
-        return []
+    # Walk the structure with an explicit stack of iterators, rather than recursing (and
+    # building an intermediate list) for every item.
     flat = []
-    if isinstance(struct, dict):
-        for _, result in struct.items():
-            flat += flatten(result)
-        return flat
-    if isinstance(struct, str):
-        return [struct]
-
-    try:
-        # if iterable
-        iterator = iter(struct)
-    except TypeError:
-        return [struct]
-
-    for result in iterator:
-        flat += flatten(result)
+    stack = [iter((struct, ))]
+    while stack:
+        for item in stack[-1]:
+            if item is None:
+                continue
+            if isinstance(item, (str, int, float)):
+                flat.append(item)
+                continue
+            if isinstance(item, dict):
+                stack.append(iter(item.values()))
+                break
+            try:
+                # if iterable
+                iterator = iter(item)
+            except TypeError:
+                flat.append(item)
+            else:
+                stack.append(iterator)
+                break
+        else:
+            stack.pop()
     return flat    
\ No newline at end of file